@@ -4,12 +4,17 @@
 # non-Intel architectures. Run with '--help' for usage.
 
 import argparse
+import concurrent.futures
+import functools
+import hashlib
+import json
 import os
 import re
+import selectors
+import shlex
 import subprocess
 import sys
 import shutil
-import packaging
 import tempfile
 import stat
 
@@ -17,61 +22,993 @@ import stat
 WINE_MAINLINE_GIT_URI = "git://source.winehq.org/git/wine.git"
 WINE_STAGING_GIT_URI = "https://github.com/wine-staging/wine-staging.git"
 
+# Cache file for host/toolchain probe results, relative to workspace root path
+PROBE_CACHE_FILE = ".buildwine-cache.json"
+
+# Failure patterns in the output of 'patch' and 'git apply'
+# "Reversed (or previously applied) patch detected!  Skipping patch." is not an error
+PATCH_ERROR_RE = re.compile(r"failed|error:", re.IGNORECASE)
+GIT_APPLY_ERROR_RE = re.compile(r"not apply|error:", re.IGNORECASE)
+
+# Machine architecture reported by the 32-bit ('linux32') personality of 64-bit hosts, see COMPAT_UTS_MACHINE
+HOST_ARCH32 = {"x86_64": "i686", "aarch64": "armv8l"}
+
+# Environment variables affecting 'configure' results (autoconf precious variables, toolchain lookup)
+CONFIGURE_CACHE_ENV_RE = re.compile(r"^(?!MAKEFLAGS$)(PATH|PKG_CONFIG.*|.*(CC|CXX|CPP|FLAGS|LIBS|DEBUG))$")
+# 'configure' arguments selecting host/target and toolchain, the autoconf cache is keyed on them.
+# Paths of the individual build (prefix, build directories) are left out to share the cache between trees.
+CONFIGURE_CACHE_ARGS_RE = re.compile(r"^(--(build|host|target)=|(build|host|target)_alias=|--enable-win64$|"
+                                     r"--with-float-abi=|--with(out)?-mingw$)")
+
+# Stamp file for 'configure' runs, relative to build path
+CONFIGURE_STAMP_FILE = ".configure.stamp"
+
+# Stamp file for 'autoreconf' and 'tools/make_requests' runs, relative to source path
+AUTOCONF_STAMP_FILE = ".autoreconf.stamp"
+# Inputs and tracked outputs of 'autoreconf' and 'tools/make_requests', relative to source path.
+# Outputs are included since a Git reset restores the versions from the repository.
+AUTOCONF_STAMP_SOURCES = ["configure.ac", "aclocal.m4", "configure", "include/config.h.in",
+                          "server/protocol.def", "include/wine/server_protocol.h"]
+
+# Wine build fixups for older Wine versions, applied in order.
+# (commit_id, first_version, fixed_version, cherry_picked_versions, binary)
+# - first_version: first affected version (inclusive), None if all older versions are affected
+# - fixed_version: first version containing the fix (exclusive), None if all newer versions are affected
+# - cherry_picked_versions: stable versions within the range which already have a cherry-pick of the commit
+#   (cherry-picks recorded with 'git cherry-pick -x' are detected by source_commits() as well)
+# - binary: commit contains binary changes, see bin_patch_apply()
+WINE_FIXUP_PATCHES = [
+    # ERROR: tools/wrc/parser.y:2840:15: error: ‘YYLEX’ undeclared (first use in this function)
+    #        and various other locations with problematic bison directives
+    # URL: https://bugs.winehq.org/show_bug.cgi?id=34329
+    # GIT: https://source.winehq.org/git/wine.git/commit/8fcac3b2bb8ce4cdbcffc126df779bf1be168882
+    # FIXED: wine-1.7.0
+    # stable >= 1.6.1 already has cherry-picks as 572f97b1add2731ed6f14e2eea1ed5db2b1071dd,
+    # 6ac684f25e12e3f490437dd101ad8150d43f43bf and db04cfc20d950d0e6e46f55d314b8f763b56e79a
+    ("3f98185fb8f88c181877e909ab1b6422fb9bca1e", "1.3.28", "1.7.0", ["1.6.1", "1.6.2"], False),
+    ("8fcac3b2bb8ce4cdbcffc126df779bf1be168882", "1.3.28", "1.7.0", ["1.6.1", "1.6.2"], False),
+    ("bda5a2ffb833b2824325bd9361b30dbaf5f78068", "1.3.28", "1.7.0", ["1.6.1", "1.6.2"], False),
+    # jscript: https://source.winehq.org/git/wine.git/commitdiff/9ebdd111264cfa646dd5219b5874166eb59217c1
+    # stable >= 1.6.1 already has cherry-pick as 2516f6d5bfb6e9395bfa98ccad9bad6e17bd82fa
+    ("ffbe1ca986bd299e1fc894440849914378adbf5c", "1.1.10", "1.7.0", ["1.6.1", "1.6.2"], False),
+    # vbscript: https://source.winehq.org/git/wine.git/commitdiff/80bcaf8d7ba68aea7090cac2a18e4e7a13147e88
+    # stable >= 1.6.1 already has cherry-pick as 8002ba95867c1f653635b23612c3136a7c899ab0
+    ("f86c46f6403fe338a544ab134bdf563c5b0934ae", "1.3.28", "1.7.0", ["1.6.1", "1.6.2"], False),
+    # wbemprox: https://source.winehq.org/git/wine.git/commitdiff/f6be21103b441180c8557aa6bc2845e5428271a4
+    # stable >= 1.6.1 already has cherry-pick as 98b1b7a89c175dee4f02e40b67f7435d765942c5
+    ("c14e322a92a24e704836c5c12207c694a30e805f", "1.5.7", "1.7.0", ["1.6.1", "1.6.2"], False),
+
+    # ERROR: err:msidb:get_tablecolumns column 1 out of range (gcc 4.9+ problem, breaks msi installers)
+    # URL: https://bugs.winehq.org/show_bug.cgi?id=36139
+    # GIT: https://source.winehq.org/git/wine.git/commit/deb274226783ab886bdb44876944e156757efe2b
+    # FIXED: wine-1.7.20
+    # NOTE: wine-1.3.22 reformatted code: 'maxcount*sizeof(*colinfo)' -> 'maxcount * sizeof(*colinfo)'
+    # https://source.winehq.org/git/wine.git/commitdiff/1ae309f98194f56b3734943cd63d8a798319fb34
+    ("deb274226783ab886bdb44876944e156757efe2b", "1.3.28", "1.7.20", [], False),
+
+    # ERROR: dlls/wineps.drv/psdrv.h:389:5: error: unknown type name ‘PSDRV_DEVMODEA’
+    # ERROR: dlls/wineps.drv/init.c:43:14: error: unknown type name ‘PSDRV_DEVMODE’
+    # ERROR: dlls/wineps.drv/init.c:605:16: error: ‘cupsGetPPD’ undeclared (first use in this function); did you mean ‘cupsGetFd’?
+    # GIT-start: https://source.winehq.org/git/wine.git/commit/d963a8f864a495f7230dc6fe717d71e61ae51d67
+    # GIT-end: https://source.winehq.org/git/wine.git/commit/72cfc219f0ba2fc3aea19760558f7820f4883176
+    # GIT: https://source.winehq.org/git/wine.git/commit/bdaddc4b7c4b4391b593a5f4ab91b8121c698bef
+    # NOTE: older versions have the module disabled in main()
+    ("bdaddc4b7c4b4391b593a5f4ab91b8121c698bef", "1.5.2", "1.5.7", [], False),
+
+    # ERROR: dlls/winspool.drv/info.c:779:13: error: ‘cupsGetPPD’ undeclared here (not in a function); did you mean ‘cupsGetFd’?
+    # URL: https://bugs.winehq.org/show_bug.cgi?id=40851
+    # GIT: https://source.winehq.org/git/wine.git/commit/10065d2acd0a9e1e852a8151c95569b99d1b3294
+    # REBASE-FIX needed due to: https://source.winehq.org/git/wine.git/commitdiff/cf0e96c6d0edc3a22b8ee5ac423d9b6b652ce0e5
+    # FIXED: wine-1.9.14
+    ("2ac0c877f591be14815902b527f314a915eee147", "1.3.28", "1.7.12", [], False),
+    # stable > 1.8.3 already has cherry-pick as 17a826192ec458b1f090021db7f03e31fbfe7464
+    ("10065d2acd0a9e1e852a8151c95569b99d1b3294", "1.7.12", "1.9.14", ["1.8.4", "1.8.5", "1.8.6", "1.8.7"], False),
+
+    # ERROR: dlls/secur32/schannel_gnutls.c:45:12: error: conflicting types for ‘gnutls_cipher_get_block_size’
+    # URL: https://bugs.debian.org/cgi-bin/bugreport.cgi?bug=832275
+    # GIT: https://source.winehq.org/git/wine.git/commit/bf5ac531a030bce9e798ab66bc53e84a65ca8fdb
+    # FIXED: wine-1.9.13
+    # stable > 1.8.3 already has cherry-pick as fad28964903e708e3236ebe72c11a6024d349db1
+    ("bf5ac531a030bce9e798ab66bc53e84a65ca8fdb", "1.7.46", "1.9.13", ["1.8.4", "1.8.5", "1.8.6", "1.8.7"], False),
+
+    # ERROR: include/winsock.h:401: warning: "INVALID_SOCKET" redefined
+    # GIT: https://source.winehq.org/git/wine.git/commit/28173f06932edd85a64a952120d29b9bb1e762ea
+    # FIXED: wine-2.13
+    # wpcap code introduced by: https://source.winehq.org/git/wine.git/commitdiff/fa67586811765d88d3b4108b3e5b4e51bb07868f
+    # stable > 2.0.2 already has cherry-pick as 773cad9f16ecc9aaf751e05cdf2f6f408c582305
+    ("28173f06932edd85a64a952120d29b9bb1e762ea", "1.7.25", "2.13", ["2.0.3", "2.0.4", "2.0.5"], True),
+
+    # wine-1.5.30-x86_64/bin/wine:
+    #       error while loading shared libraries: libwine.so.1: cannot open shared object file: No such file or directory
+    # URL: https://bugs.winehq.org/show_bug.cgi?id=33560
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/ce4b6451aabbe83809c7483c748cfa009cc090d6
+    # FIXED: wine-1.5.31
+    ("ce4b6451aabbe83809c7483c748cfa009cc090d6", "1.5.30", "1.5.31", [], False),
+
+    # ERROR: rm -f fonts && ln -s ../mainline-build-1.9.5-x86_64/fonts fonts
+    #        rm: cannot remove 'fonts': Is a directory
+    # URL: https://bugs.winehq.org/show_bug.cgi?id=40253
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/c6d6dcee47eb97fd75e389434d4136de2f31414c
+    # FIXED: wine-1.9.6
+    ("c6d6dcee47eb97fd75e389434d4136de2f31414c", "1.9.5", "1.9.6", [], False),
+
+    # ERROR: gstreamer-1.0 base plugins 32-bit development files not found, gstreamer support disabled
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/20d41d9e2810696ca38598abcef6da8e77f9aae7
+    # FIXED: wine-2.10
+    ("20d41d9e2810696ca38598abcef6da8e77f9aae7", "1.4", "2.10", [], False),
+
+    # configure: Don't use X_PRE_LIBS.
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/bb50d6fd9512a9a05306c56112bbcdc6de6c8d65
+    # FIXED: wine-1.7.2
+    # stable >= 1.6.1 already has cherry-pick as 4238c42c7c5168841b5703ed20f2a6cef403b181
+    ("bb50d6fd9512a9a05306c56112bbcdc6de6c8d65", "1.5.17", "1.7.2", ["1.6.1", "1.6.2"], False),
+
+    # ERROR: configure: libOSMesa 64-bit development files not found (or too old)
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/f625707ffc38c58cc296c8a27ac6c2b3e1c38249
+    # REBASE-FIX needed due to: https://source.winehq.org/git/wine.git/commitdiff/cf0e96c6d0edc3a22b8ee5ac423d9b6b652ce0e5
+    # FIXED: wine-2.7
+    ("324305bb282aa4d4de471c43d5c129d2bdd97711", "1.6", "1.7.12", [], False),
+    # stable > 2.0.4 already has cherry-pick
+    ("f625707ffc38c58cc296c8a27ac6c2b3e1c38249", "1.7.12", "2.7", ["2.0.5"], False),
+
+    # backport for prelink support
+    # winegcc: Set the LDDLLFLAGS according to the target platform.
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/2374cd52a72d685d4f7ddb88456a846e6396415f
+    # FIXED: wine-1.7.1
+    ("2374cd52a72d685d4f7ddb88456a846e6396415f", "1.5.30", "1.7.1", [], False),
+    # configure: WARNING: prelink not found, base address of core dlls won't be set correctly.
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a35f9a13a80fa93c251e12402a73a38a89ec397f
+    # FIXED: wine-1.7.54
+    ("a35f9a13a80fa93c251e12402a73a38a89ec397f", "1.5.30", "1.7.54", [], False),
+
+    # Fix build failure ('major' undefined) in glibc 2.28.
+    # ERROR: server/fd.c:922:9: warning: implicit declaration of function ‘major’ [-Wimplicit-function-declaration]
+    #                  922 |     if (major(dev) == FLOPPY_MAJOR) return 1;
+    #        /usr/bin/ld: fd.o: in function `is_device_removable':
+    #         server/fd.c:922: undefined reference to `major'
+    #         collect2: error: ld returned 1 exit status
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/ca8a08606d3f0900b3f4aa8f2e6547882a22dba8
+    # FIXED: wine-1.9.9
+    # stable > 1.8.2 already has cherry-pick as d133be20b15f0656430e48ff681fd6bab786528c
+    ("ca8a08606d3f0900b3f4aa8f2e6547882a22dba8", "1.7.44", "1.9.9", ["1.8.3", "1.8.4", "1.8.5", "1.8.6", "1.8.7"], False),
+    # REBASE-FIX needed for ca8a08606d3f0900b3f for older Wine versions
+    ("4f862879c86aedef6d81982d4f828a3109b2192f", None, "1.7.44", [], False),
+
+    # Fix build failure for glibc 2.30+
+    # ERROR: dlls/ntdll/directory.c:145:19: error: conflicting types for ‘getdents64’
+    #         145 | static inline int getdents64( int fd, char *de, unsigned int size )
+    #        In file included from /usr/include/dirent.h:404,
+    #             from dlls/ntdll/directory.c:29:
+    #        /usr/include/bits/dirent_ext.h:29:18: note: previous declaration of ‘getdents64’ was here
+    #   29 | extern __ssize_t getdents64 (int __fd, void *__buffer, size_t __length)
+    # make[1]: *** [Makefile:393: directory.o] Error 1
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/12fc123338f7af601d3fe76b168a644fcd7e1362
+    # Smaller custom fix needed due to change buried in large rework commit.
+    # FIXED: wine-1.9.10
+    # Intermediate fixup because d189f95d71f1246a doesn't apply cleanly on older Wine versions
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/606c88a348fa240359a25aa5a3659a0b41ee0cb4
+    ("606c88a348fa240359a25aa5a3659a0b41ee0cb4", "1.5.11", "1.5.23", [], False),
+    # Intermediate fixup because d189f95d71f1246a doesn't apply cleanly on older Wine versions
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/3ae113a957d396d400a88259634e2870368f307b
+    ("3ae113a957d396d400a88259634e2870368f307b", "1.5.11", "1.7.26", [], False),
+    ("d189f95d71f1246a8683b14c5b64b0ec5308492f", "1.5.11", "1.9.10", [], False),
+    ("cba95b7eb3986b201dfca5a3e6d9065edecb8188", None, "1.5.11", [], False),
+
+    # Freetype 2.8.1 build failures
+    # ERROR: ../tools/sfnt2fon/sfnt2fon -o coure.fon .../mainline-src-2.17/fonts/courier.ttf -d 128 13,1252,8
+    #        Error: Cannot open face .../mainline-src-2.17/fonts/courier.ttf
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/40166848a7944383a4cfdaac9b18bd03fbb2b4f9
+    #      https://source.winehq.org/git/wine.git/commitdiff/7ea82a02079d1600191743cc2c148955efe725fb
+    #      https://source.winehq.org/git/wine.git/commitdiff/d82321006de92dcd74465c905121618a76eae76a
+    #      https://source.winehq.org/git/wine.git/commitdiff/89e79d8144308a24676ef069d567a14655985b0c
+    # FIXED: wine-2.18
+    # stable > 2.0.2 already has cherry-picks
+    ("89e79d8144308a24676ef069d567a14655985b0c", "1.7.12", "2.18", ["2.0.3", "2.0.4", "2.0.5"], False),
+    ("8ef70039d366bf45900c7e7999767be2ccf9704c", None, "1.5.16", [], False),
+    ("7cd8dc6bf2b0d81338db9a6d13669b2f31da33d8", None, "1.5.16", [], False),
+    ("d82321006de92dcd74465c905121618a76eae76a", None, "2.18", ["2.0.3", "2.0.4", "2.0.5"], False),
+    ("7ea82a02079d1600191743cc2c148955efe725fb", "1.7.12", "2.18", [], False),
+    ("40166848a7944383a4cfdaac9b18bd03fbb2b4f9", "1.7.12", "2.18", ["2.0.3", "2.0.4", "2.0.5"], True),
+    # REBASE-FIX needed for 7ea82a02079d16 and 40166848a7944383a for older Wine versions
+    # Apply prerequisite patches on older Wine versions because a326e29144b74c0b3a doesn't apply cleanly
+    ("3e6199904f4fc2bf1612f210e07e18435a46a38f", None, "1.4-rc1", [], True),
+    ("5d2b9eb9d3e15c3787571000e6a75673a42a0c49", None, "1.4-rc1", [], True),
+    ("a926bfdb061ffcdc3c6f88b29fca614f9f12fa78", None, "1.4-rc1", [], True),
+    ("4b71072b861cc396c4c50806db034f98869e2cc1", None, "1.4-rc1", [], True),
+    # Wine 1.4.1 has this as cherry-pick:
+    # https://source.winehq.org/git/wine.git/commitdiff/1823a4ae52b970436943760f028e2c154fd9985d
+    ("4f819f8efcd08e29a1a7650300e204839b43af2c", None, "1.5.2", ["1.4.1"], True),
+    ("fc42bfe60f3a29c4ce0ed47eb03cc3125be904fd", None, "1.5.2", [], True),
+    ("679385fd1cd2c405ac0d3745863d827293a3b445", None, "1.5.16", [], True),
+    ("673617ee4eb15aa778859d3bcc227e8d8a514e01", None, "1.5.16", [], True),
+    ("e070173ac6316cd9afc2755087d8e6b95b6cdafe", None, "1.5.18", [], True),
+    ("1a6e9d4a50ec4a1a5464ca9c3bb02921d50eb777", None, "1.5.18", [], True),
+    ("9d71d29f26a6f89d4e603c60e355d2ed39153b7f", None, "1.5.20", [], True),
+    ("1b17f0fd5ded290a332260cad963dac53c08609f", None, "1.5.25", [], True),
+    ("6eaa345261fad0e0a0e04f265ce6f731302ed674", None, "1.5.28", [], True),
+    ("c4408e0b621b99115247386e7095231be7e1045d", None, "1.5.28", [], True),
+    ("d29f6c41eb13e647a311091956af3131633e7eda", None, "1.5.31", [], False),
+    ("3f0e3ef6b4f422d0528d8031bbad3727face17dd", None, "1.5.31", [], True),
+    ("8e2cd615c3dc884dc76bd75a77d35fc1fcaf8217", None, "1.5.31", [], True),
+    ("121f82bff7665794be6fee841ddfda6973cc7c46", None, "1.6-rc2", [], True),
+    ("2fd3ec7d068ef925e5720222e92cfda4f6badd2a", None, "1.6-rc2", [], True),
+    ("74b2cb58f7f1192d6b0a7c1bc31a64eb92ccaa86", None, "1.6-rc5", [], True),
+    ("66f641896b8056a818b06f07055d1161c36941c1", None, "1.6-rc5", [], True),
+    ("eb29e639e579535009a4626fede64e3cf34e7009", None, "1.6-rc5", [], True),
+    ("994f74fb46285130cc63784449176c748cfdfaaf", None, "1.6-rc5", [], True),
+    ("7983df22cfd97399575652e72c90203597a818a7", None, "1.6-rc5", [], True),
+    ("80a17baf20da4620394f8832f6221edf45b7a0f0", None, "1.6-rc5", [], True),
+    # REBASE-FIX for 7ea82a02079d16 and 40166848a7944383a for older Wine versions
+    ("a326e29144b74c0b3a0261142892192b99607141", None, "1.7.12", [], True),
+
+    # wpcap: Fix compilation with recent pcap/pcap.h versions.
+    # ERROR: In file included from .../include/winsock2.h:50,
+    #        from ... dlls/wpcap/wpcap.c:27:
+    #        .../include/ws2def.h:60:19: error: redefinition of ‘struct sockaddr_storage’
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/40c9b46500c3606e966d5404d45b68a48609b6ea
+    # FIXED: wine-4.3
+    # stable > 4.0.1 already has cherry-pick as 2a532f4809fc0328877c1f8219609c526daaba8b
+    ("40c9b46500c3606e966d5404d45b68a48609b6ea", "1.7.25", "4.3", ["4.0.1", "4.0.2", "4.0.3", "4.0.4"], False),
+
+    # loader/preloader build failure with GCC 10.x optimizing wld_memset() into a memset(3) call.
+    # ERROR:  /usr/bin/ld: preloader.o: in function `wld_memset':
+    #          .../loader/preloader.c:455: undefined reference to `memset'
+    #          collect2: error: ld returned 1 exit status
+    #          make[1]: *** [Makefile:335: wine64-preloader] Error 1
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a6fdf73233d3df4435680d921f68089630bc9c64
+    # FIXED: wine-1.5.21
+    ("a6fdf73233d3df4435680d921f68089630bc9c64", None, "1.5.21", [], False),
+
+    # /usr/bin/ld: ios.o: relocation R_X86_64_32 against symbol `basic_streambuf_char_overflow'
+    #          can not be used when making a shared object; recompile with -fPIC
+    #       make[1]: *** [Makefile:338: msvcp90.dll.so] Error 2
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/72999eac5b315102d3d7d48aaf6d687ca8ec8d96
+    #      https://source.winehq.org/git/wine.git/commitdiff/07a9909ccaea1e9626731c4b259f555877d50bb2
+    ("07a9909ccaea1e9626731c4b259f555877d50bb2", None, "1.3.35", [], False),
+    ("72999eac5b315102d3d7d48aaf6d687ca8ec8d96", None, "1.3.35", [], False),
+
+    # libxml2 fixes
+    #  ../dlls/msxml3/mxwriter.c:412:60: error: invalid use of incomplete typedef â€˜xmlBufâ€™ {aka â€˜struct _xmlBufâ€™}
+    #    412 |                                          This->buffer->conv->use/sizeof(WCHAR));
+    #    make[1]: *** [Makefile:215: mxwriter.o] Error 1
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a4b24978e9dc2e54057552fc2efffbd58cc25d0a
+    #      https://source.winehq.org/git/wine.git/commitdiff/197d41156a1a237eb2073524ec36006d6a26ceaa
+    #      https://source.winehq.org/git/wine.git/commitdiff/b0f704daaf633d8c713c9212a2ab5dd8a4457e7a
+    #      https://source.winehq.org/git/wine.git/commitdiff/d80ee5b3ae36275f813b096576b5beecea2c2d60
+    #      https://source.winehq.org/git/wine.git/commitdiff/fda8c2177d01c767c020864370cf9dfaf7b6755d
+    #      https://source.winehq.org/git/wine.git/commitdiff/35c7c694294d5461b84e18b17b65a99068050e8b
+    ("a4b24978e9dc2e54057552fc2efffbd58cc25d0a", None, "1.3.35", [], False),
+    ("197d41156a1a237eb2073524ec36006d6a26ceaa", None, "1.3.35", [], False),
+    ("b0f704daaf633d8c713c9212a2ab5dd8a4457e7a", None, "1.3.35", [], False),
+    ("d80ee5b3ae36275f813b096576b5beecea2c2d60", None, "1.3.35", [], False),
+    ("fda8c2177d01c767c020864370cf9dfaf7b6755d", None, "1.3.35", [], False),
+    ("35c7c694294d5461b84e18b17b65a99068050e8b", None, "1.3.35", [], False),
+
+    # ERROR: 'err:msi:MSI_OpenDatabaseW unknown flag (nil)' ... 'err:msi:msi_apply_patch_package
+    # Fixup for GCC 9.x/10.x/MinGW
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/cce9a5f124ae6d3fffcc7772cab6523f09a1e3d1
+    # FIXED: wine-4.20
+    # MSI changes in Wine 1.7.38 and 1.7.39 make patch/rebase way too much effort hence skip fix below
+    ("cce9a5f124ae6d3fffcc7772cab6523f09a1e3d1", "1.7.40", "4.20", [], False),
+
+    # mpg123: Fix compilation with clang.
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/981306c1f01112719850439a74e13693dfa6d3a4
+    ("981306c1f01112719850439a74e13693dfa6d3a4", "6.20", "6.21", [], False),
+
+    # opencl: Fix compilation on MSVC targets.
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a91d6e9eae71a0ed0ddeac3d571704fd3e47b3c5
+    ("a91d6e9eae71a0ed0ddeac3d571704fd3e47b3c5", "6.5", "6.18", [], False),
+
+    # ERROR: winebuild: llvm-mingw-20211002-ucrt-ubuntu-18.04-x86_64/bin/x86_64-w64-mingw32-dlltool failed with status 1
+    #        make: *** [Makefile:1843: dlls/advpack/libadvpack.delay.a] Error 1
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/f29d4a43e203303c2d4aaec388f281d01f17764c
+    # FIXED: wine-5.3
+    ("f29d4a43e203303c2d4aaec388f281d01f17764c", "5.2", "5.3", [], False),
+
+    # ERROR: /usr/bin/ld: dlls/dnsapi/libresolv.o: in function `resolv_query':
+    #        .../dlls/dnsapi/libresolv.c:897: undefined reference to `ns_initparse'
+    #       /usr/bin/ld: .../dlls/dnsapi/libresolv.c:769: undefined reference to `ns_parserr'
+    # URL: https://bugs.winehq.org/show_bug.cgi?id=51635
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a3bbf5137707abb548ff642826992b7069bef1de
+    # FIXED: wine-6.16
+    ("a3bbf5137707abb548ff642826992b7069bef1de", "6.6", "6.16", [], False),
+
+    # ERROR: ../../tools/winegcc/winegcc -o ntdll.dll.so -B../../tools/winebuild -m64 -fasynchronous-unwind-tables -shared
+    #        mainline-src-1.7.45/dlls/ntdll/ntdll.spec \
+    #        ...
+    #        /usr/bin/ld: signal_x86_64.o: in function `libunwind_virtual_unwind':
+    #        mainline-src-1.7.45/dlls/ntdll/signal_x86_64.c:1554: undefined reference to `_Ux86_64_getcontext'
+    # GIT: https://source.winehq.org/git/wine.git/commitdiff/36a9f9dd05c3b9df77c44c91663e9bd6cae1c848
+    ("36a9f9dd05c3b9df77c44c91663e9bd6cae1c848", "1.7.45", "1.7.46", [], False),
+]
+
+@functools.lru_cache(maxsize=None)
 def parse_version(version):
-    """Use parse from packaging.version or LooseVersion from distutils.version"""
-    global parse_version, Version
+    """Parse a Wine version string using packaging.version (distutils was removed with Python 3.12)
+
+    Parameters:
+        version (str): Wine version string, e.g. '5.5' or '1.6-rc2'.
+    Returns:
+        Version object, None if the version string is invalid.
+
+    """
+    # imported on first use, '--help' doesn't need it
+    from packaging.version import InvalidVersion, Version
+
     try:
-        from packaging.version import Version
-        from packaging.version import parse as parse_version
-    except ImportError:
-        from distutils.version import LooseVersion as parse_version
-    return parse_version(version)
+        return Version(version)
+    except InvalidVersion:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def resolve_executable(name, path):
+    """Resolve an executable name to its absolute path
+
+    Parameters:
+        name (str): Executable name, names containing a directory are left alone.
+        path (str): PATH to search in.
+    Returns:
+        Absolute path to executable, the unchanged name if not found (subprocess reports the error).
+
+    """
+    if os.path.dirname(name):
+        return name
+    return shutil.which(name, path=path) or name
+
+def shell_command(command, env=None):
+    """Prepare the specified command for subprocess execution
+
+    Parameters:
+        command (str or list): Linux shell command or argument vector.
+        env (str): Custom shell environment the command is run with.
+    Returns:
+        (args, shell) tuple to be passed to subprocess.
+
+    """
+    # Argument vectors are executed directly, without forking an intermediate shell.
+    # The executable is looked up once instead of on every exec, an absolute path is also
+    # a precondition for subprocess to use posix_spawn().
+    if isinstance(command, list):
+        return [resolve_executable(command[0], (env or os.environ).get("PATH", os.defpath))] + command[1:], False
+    # Some commands involve pipelines hence prefix with 'pipefail' to capture failure as well
+    return "set -o pipefail && {0}".format(command), True
+
+def run_command(command, cwd=None, env=None, logfile=None, append=False, check=True):
+    """Run the specified command in a subprocess shell and show stdout
+
+    Parameters:
+        command (str or list): Linux shell command or argument vector (executed without shell).
+        cwd (str): Working directory for the command.
+        env (str): Custom shell environment for the intermediate shell.
+        logfile (str): Log file to duplicate stdout/stderr into, relative to cwd.
+        append (bool): Append to the log file instead of truncating it.
+        check (bool): Raise on non-zero exit code, equivalent of '|| true' if False.
+    Returns:
+        if executed process exit code is non-zero and check is set, raises a CalledProcessError.
+
+    """
+    run_commands([(command, cwd, logfile)], env, append=append, check=check)
+
+def run_command_stdout(command, cwd=None, env=None, stderr=None):
+    """Run the specified command in a subprocess shell and return stdout
+
+    Parameters:
+        command (str or list): Linux shell command or argument vector (executed without shell).
+        cwd (str): Working directory for the command.
+        env (str): Custom shell environment for the intermediate shell.
+        stderr: stderr handling as in subprocess.run(), e.g. subprocess.DEVNULL.
+    Returns:
+        stdout as string
+        if executed process exit code is non-zero, raises a CalledProcessError.
+
+    """
+    print("[*] Running following command:")
+    print("'{0}' (cwd='{1}')".format(command if isinstance(command, str) else " ".join(command), cwd))
+
+    args, shell = shell_command(command, env)
+    return subprocess.run(args, stdout=subprocess.PIPE, stderr=stderr,
+                        cwd=cwd, env=env, shell=shell, encoding="utf8").stdout.rstrip(os.linesep)
+
+def run_pipeline_stdout(commands, cwd=None, env=None):
+    """Run the specified argument vectors as pipeline without shell and return stdout
+
+    Parameters:
+        commands (list): Argument vectors, stdout of each one is connected to stdin of the next one.
+        cwd (str): Working directory for the commands.
+        env (str): Custom shell environment for the commands.
+    Returns:
+        stdout and stderr of the last command as string (exit codes are not checked)
+
+    """
+    print("[*] Running following command:")
+    print("'{0}' (cwd='{1}')".format(" | ".join(" ".join(command) for command in commands), cwd))
+
+    processes = []
+    stdin = None
+    for command in commands[:-1]:
+        processes.append(subprocess.Popen(shell_command(command, env)[0], stdin=stdin, stdout=subprocess.PIPE,
+                                          cwd=cwd, env=env))
+        # only the next process of the pipeline holds the read end
+        if stdin:
+            stdin.close()
+        stdin = processes[-1].stdout
+    result = subprocess.run(shell_command(commands[-1], env)[0], stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            cwd=cwd, env=env, encoding="utf8")
+    if stdin:
+        stdin.close()
+    for process in processes:
+        process.wait()
+    return result.stdout.rstrip(os.linesep)
+
+def run_commands(commands, env=None, pass_fds=(), append=True, check=True):
+    """Run the specified commands concurrently in subprocess shells and show stdout
+
+    Parameters:
+        commands (list): (command, cwd, logfile) tuples, see run_command().
+        env (str): Custom shell environment for the intermediate shells.
+        pass_fds (tuple): File descriptors to keep open in the child processes.
+        append (bool): Append to the log files instead of truncating them.
+        check (bool): Raise on non-zero exit code.
+    Returns:
+        if any executed process exit code is non-zero and check is set, raises a CalledProcessError.
+
+    """
+    processes = []
+    logs = {}
+    try:
+        for command, cwd, logfile in commands:
+            print("[*] Running following command:")
+            print("'{0}' (cwd='{1}')".format(command if isinstance(command, str) else " ".join(command), cwd))
+            sys.stdout.flush()
+
+            args, shell = shell_command(command, env)
+            if not logfile:
+                processes.append((command, subprocess.Popen(args, cwd=cwd, env=env, shell=shell, pass_fds=pass_fds,
+                                stderr=sys.stderr, stdout=sys.stdout)))
+                continue
+
+            # Duplicate the output in Python instead of piping it through 'tee'
+            process = subprocess.Popen(args, cwd=cwd, env=env, shell=shell, pass_fds=pass_fds,
+                                stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
+            processes.append((command, process))
+            logs[process.stdout.fileno()] = open(os.path.join(cwd or "", logfile), 'ab' if append else 'wb')
+
+        # Copy output chunks as they arrive, the pipes are read directly to avoid line buffering.
+        # The default selector is epoll based on Linux, no FD_SETSIZE limit and no fd set copies per wakeup.
+        with selectors.DefaultSelector() as selector:
+            for fd, log in logs.items():
+                selector.register(fd, selectors.EVENT_READ, log)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        selector.unregister(key.fd)
+                        continue
+                    sys.stdout.buffer.write(data)
+                    sys.stdout.buffer.flush()
+                    key.data.write(data)
+    finally:
+        for log in logs.values():
+            log.close()
+
+    # always wait for all processes, report the first failure
+    failure = None
+    for command, process in processes:
+        if process.wait() and not failure:
+            failure = subprocess.CalledProcessError(process.returncode, command)
+    if failure and check:
+        raise failure
+
+def available_cpus():
+    """ Get the number of CPUs usable by this process.
+        Respects the CPU affinity mask and a cgroup v2 CPU quota, e.g. on container based builders.
+
+    Parameters:
+        none.
+
+    Returns:
+        Number of usable CPUs, at least one.
+
+    """
+
+    # the affinity mask isn't available on all platforms
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            # round up, a quota of 1.5 CPUs still keeps two jobs busy most of the time
+            cpus = min(cpus, -(-int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+def create_make_jobserver(jobs, clients):
+    """ Create a GNU Make jobserver to share job slots among concurrently running top-level 'make' processes.
+
+    Parameters:
+        jobs (int): Total number of jobs.
+        clients (int): Number of top-level 'make' processes sharing the jobserver.
+
+    Returns:
+        (read_fd, write_fd) tuple of the jobserver pipe.
+
+    """
+
+    read_fd, write_fd = os.pipe()
+    # each top-level 'make' owns one implicit job slot, the pipe holds the remaining tokens
+    os.write(write_fd, b"+" * max(jobs - clients, 0))
+    return read_fd, write_fd
+
+@functools.lru_cache(maxsize=None)
+def load_probe_cache(cache_path):
+    """ Load the persistent probe cache from disk, once per run.
+
+    Parameters:
+        cache_path (str): Path to JSON cache file.
+
+    Returns:
+        Cache as dictionary, empty if the file doesn't exist or is unreadable.
+
+    """
+
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def cached_probe(cache_path, key, probe):
+    """ Return the result of a host/toolchain probe, only running it on cache miss.
+
+    Parameters:
+        cache_path (str): Path to JSON cache file.
+        key (str): Cache key, must encode everything the probe result depends on.
+        probe (callable): Function returning the probe result as string.
+
+    Returns:
+        Probe result as string.
+
+    """
+
+    cache = load_probe_cache(cache_path)
+    if key not in cache:
+        result = probe()
+        # don't persist failed probes
+        if not result:
+            return result
+        cache[key] = result
+        # write to a temporary file first to never leave a truncated cache behind
+        cache_path_tmp = "{0}.{1}".format(cache_path, os.getpid())
+        with open(cache_path_tmp, 'w') as f:
+            json.dump(cache, f, indent=4, sort_keys=True)
+        os.replace(cache_path_tmp, cache_path)
+    return cache[key]
+
+@functools.lru_cache(maxsize=None)
+def host_arch(cache_path, personality):
+    """ Determine the host machine architecture for the given 'setarch' personality.
+
+    Parameters:
+        cache_path (str): Path to JSON cache file.
+        personality (str): Execution domain, e.g. 'linux64' or 'linux32'.
+
+    Returns:
+        Machine architecture as reported by 'uname -m'.
+
+    """
+
+    # native personality of a 64-bit host, no need to spawn a process
+    # a 32-bit personality (e.g. 'setarch i686 ./buildwine.py') reports the 32-bit machine, probe it then
+    if personality == "linux64" and sys.maxsize > 2**32 and os.uname().machine not in HOST_ARCH32.values():
+        return os.uname().machine
+    if personality == "linux32" and sys.maxsize > 2**32 and os.uname().machine in HOST_ARCH32:
+        return HOST_ARCH32[os.uname().machine]
+    # already running with a 32-bit personality (or 32-bit kernel), it's reported as is
+    if personality == "linux32" and os.uname().machine in HOST_ARCH32.values():
+        return os.uname().machine
+
+    return cached_probe(cache_path, "uname:{0}:{1}".format(os.uname().machine, personality),
+                        lambda: run_command_stdout(["setarch", personality, "uname", "-m"]))
+
+@functools.lru_cache(maxsize=None)
+def cross_target_arch(cache_path, cross_compile_prefix):
+    """ Determine the target machine architecture of a cross-toolchain.
+
+    Parameters:
+        cache_path (str): Path to JSON cache file.
+        cross_compile_prefix (str): Cross-toolchain prefix.
+
+    Returns:
+        Target architecture, first component of 'gcc -dumpmachine' target triplet.
+
+    """
+
+    cross_gcc = shutil.which("{0}gcc".format(cross_compile_prefix))
+    if not cross_gcc:
+        sys.exit("Cross-compiler '{0}gcc' not found, aborting!".format(cross_compile_prefix))
+    # the compiler modification time invalidates the entry when the toolchain gets replaced
+    return cached_probe(cache_path, "dumpmachine:{0}:{1}:{2}".format(
+                        os.uname().machine, cross_gcc, os.stat(cross_gcc).st_mtime_ns),
+                        lambda: run_command_stdout([cross_gcc, "-dumpmachine"]).split("-", 1)[0])
+
+@functools.lru_cache(maxsize=None)
+def compiler_target_help(cache_path, cc):
+    """ Query the target specific options of a compiler.
+
+    Parameters:
+        cache_path (str): Path to JSON cache file.
+        cc (str): Compiler command line, e.g. value of $CC.
+
+    Returns:
+        Output of 'cc -Q --help=target' as string.
+
+    """
+
+    cc_args = shlex.split(cc)
+    cc_path = shutil.which(cc_args[0])
+    if not cc_path:
+        sys.exit("Compiler '{0}' not found, aborting!".format(cc_args[0]))
+    # the compiler flags are part of the key, they can change the reported defaults
+    return cached_probe(cache_path, "help-target:{0}:{1}:{2}".format(
+                        cc_path, os.stat(cc_path).st_mtime_ns, " ".join(cc_args[1:])),
+                        lambda: run_command_stdout([cc_path] + cc_args[1:] + ["-Q", "--help=target"]))
+
+def remove_tree(path):
+    """ Remove a directory tree in the background.
+        The tree is renamed first which is instant, the actual deletion doesn't block the build.
+
+    Parameters:
+        path (str): Path to directory tree, might not exist.
+
+    Returns:
+        none.
+
+    """
+
+    if not path or not os.path.exists(path):
+        return
+
+    path_deleting = "{0}.deleting.{1}".format(path, os.getpid())
+    try:
+        os.rename(path, path_deleting)
+    except OSError:
+        # e.g. mount point, remove in place
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    subprocess.Popen(["rm", "-rf", path_deleting], start_new_session=True,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def workspace_dir(workspace_path, name, dash_version="", arch=""):
+    """ Build the path of a directory in the workspace, e.g. '<workspace>/staging-build-6.0-x86_64'.
+
+    Parameters:
+        workspace_path (str): Workspace root path.
+        name (str): Directory base name, e.g. 'mainline-src' or 'staging-build'.
+        dash_version (str): Wine version prefixed with dash, empty for Git HEAD builds.
+        arch (str): Target machine architecture for build and install directories.
+
+    Returns:
+        Path to directory.
+
+    """
+
+    return "{0}/{1}{2}{3}".format(workspace_path, name, dash_version, "-{0}".format(arch) if arch else "")
+
+def ensure_clone(uri, dst, extra_args=()):
+    """ Clone a Git repository unless the destination is a repository already.
+        The existing repository check is local and cheap, the clone keeps its progress and error output.
+
+    Parameters:
+        uri (str): Repository to clone from.
+        dst (str): Destination path.
+        extra_args (tuple): Additional 'git clone' arguments.
+
+    Returns:
+        True if freshly cloned, False if the repository was already present.
+        Raises a CalledProcessError if the clone failed.
+
+    """
+
+    if os.path.exists(dst):
+        # bare repositories are their own Git directory, non-bare ones have '.git'
+        git_dir = subprocess.run(["git", "-C", dst, "rev-parse", "--absolute-git-dir"], stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL, encoding="utf8").stdout.rstrip(os.linesep)
+        if git_dir and os.path.realpath(git_dir) in (os.path.realpath(dst),
+                                                     os.path.realpath(os.path.join(dst, ".git"))):
+            print("[*] Repository '{0}' already present".format(dst))
+            return False
+
+    run_command(["git", "clone"] + list(extra_args) + [uri, dst])
+    return True
+
+def ensure_repo(uri, dst, clone_args=(), fetch_args=()):
+    """ Clone a Git repository or, if already present, fetch updates into it.
+
+    Parameters:
+        uri (str): Repository to clone from.
+        dst (str): Destination path.
+        clone_args (tuple): Additional 'git clone' arguments.
+        fetch_args (tuple): 'git fetch' arguments for updating an existing repository, None to skip updating.
+
+    Returns:
+        True if freshly cloned, False if the repository was already present.
+
+    """
+
+    if ensure_clone(uri, dst, clone_args):
+        return True
+    if fetch_args is None:
+        return False
+    # failed updates are not fatal, e.g. when working offline
+    run_command(["git", "fetch"] + list(fetch_args), cwd=dst, check=False)
+    return False
+
+def git_head_commit(source_path):
+    """ Resolve the HEAD commit of a Git repository by reading the Git directory, without spawning 'git'.
+
+    Parameters:
+        source_path (str): Path to source tree, might be a linked worktree.
+
+    Returns:
+        Commit sha1, None if it can't be resolved this way (e.g. not a Git repository, reftable backend).
+
+    """
+
+    git_dir = os.path.join(source_path, ".git")
+    try:
+        # linked worktrees have a '.git' file pointing to their private Git directory
+        if os.path.isfile(git_dir):
+            with open(git_dir) as f:
+                git_dir = os.path.join(source_path, f.read().split("gitdir:", 1)[1].strip())
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+        if not head.startswith("ref: "):
+            # detached HEAD
+            return head
+        ref = head[len("ref: "):]
+
+        # branches of linked worktrees are stored in the main repository
+        common_dir = git_dir
+        if os.path.isfile(os.path.join(git_dir, "commondir")):
+            with open(os.path.join(git_dir, "commondir")) as f:
+                common_dir = os.path.join(git_dir, f.read().strip())
+        try:
+            with open(os.path.join(common_dir, ref)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            with open(os.path.join(common_dir, "packed-refs")) as f:
+                for line in f:
+                    if line.rstrip("\n").endswith(" " + ref):
+                        return line.split(" ", 1)[0]
+    except (OSError, IndexError):
+        pass
+    return None
+
+def describe_version(cache_path, source_path, rev=None):
+    """ Determine the Wine version from the most recent 'wine-*' tag reachable from a revision.
+
+    Parameters:
+        cache_path (str): Path to JSON cache file.
+        source_path (str): Path to source tree.
+        rev (str): Tag to describe, HEAD of the source tree if not given.
+
+    Returns:
+        Wine version string, empty if not found.
+
+    """
+
+    describe = lambda: run_command_stdout(["git", "describe", "--abbrev=0"] + ([rev] if rev else []),
+                                          source_path, stderr=subprocess.DEVNULL).replace("wine-", "", 1)
+    # tags don't move, HEAD is keyed on its commit and the tags, newly fetched ones might be closer to it
+    if rev:
+        return cached_probe(cache_path, "describe:{0}".format(rev), describe)
+    head = git_head_commit(source_path)
+    if not head:
+        return describe()
+    tags = hashlib.sha256(run_command_stdout(["git", "for-each-ref", "--format=%(objectname) %(refname)",
+                                              "refs/tags"], source_path).encode()).hexdigest()
+    return cached_probe(cache_path, "describe:{0}:{1}".format(head, tags), describe)
+
+def is_git_worktree(source_path):
+    """ Check if a source tree is a linked Git worktree (sharing objects and refs with another repository).
+
+    Parameters:
+        source_path (str): Path to source tree.
+
+    Returns:
+        True if linked worktree, False otherwise.
+
+    """
+
+    # linked worktrees have a '.git' file pointing to the main repository instead of a directory
+    return os.path.isfile(os.path.join(source_path, ".git"))
+
+@functools.lru_cache(maxsize=None)
+def source_commits(source_path):
+    """ Collect all commits reachable from HEAD of a source repository, once per run.
+        Patches are applied to the working tree only, HEAD doesn't move while fixups are applied.
+        Commits recorded as cherry-picked ('git cherry-pick -x'), e.g. in stable branches, count as present.
+
+    Parameters:
+        source_path (str): Path to source repository.
+
+    Returns:
+        Set of commit sha1s.
+
+    """
+
+    # single history walk for both, the commit sha1s and the cherry-pick origins in the commit messages
+    log = run_command_stdout(["git", "log", "--format=commit %H%n%b", "HEAD"], source_path)
+    return frozenset(commit_id or cherry_picked_id for commit_id, cherry_picked_id in re.findall(
+                     r"^commit ([0-9a-f]{40})$|\(cherry picked from commit ([0-9a-f]{40})\)", log, re.MULTILINE))
+
+def configure_digest(source_path, configure_args, env):
+    """ Compute a digest of everything a 'configure' invocation depends on, except installed packages.
+
+    Parameters:
+        source_path (str): Path to source repository.
+        configure_args (list): 'configure' argument vector.
+        env (dict): Environment 'configure' is run with.
+
+    Returns:
+        Digest as hex string.
+
+    """
+
+    digest = hashlib.sha256(repr((configure_args, sorted((key, value) for key, value in env.items()
+                            if CONFIGURE_CACHE_ENV_RE.match(key)))).encode())
+    with open(os.path.join(source_path, "configure"), 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+def configure_cache_file(configure_args, env):
+    """ Determine the autoconf cache file for a 'configure' invocation.
+        The cache file is keyed on the toolchain and its environment and the host/target options,
+        so build directories of all versions and variants with the same toolchain share it.
 
-def run_command(command, cwd=None, env=None):
-    """Run the specified command in a subprocess shell and show stdout
+    Parameters:
+        configure_args (list): 'configure' argument vector.
+        env (dict): Environment 'configure' is run with.
+
+    Returns:
+        Full path to cache file, to be passed via '--cache-file'.
+
+    """
+
+    digest = hashlib.sha256(repr(([arg for arg in configure_args if CONFIGURE_CACHE_ARGS_RE.match(arg)],
+                            sorted((key, value) for key, value in env.items()
+                            if CONFIGURE_CACHE_ENV_RE.match(key)))).encode())
+
+    cache_path = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "buildwine")
+    os.makedirs(cache_path, exist_ok=True)
+    return os.path.join(cache_path, "config-{0}.cache".format(digest.hexdigest()))
+
+def run_configure(source_path, build_path, configure_args, env, logfile, use_cache=False):
+    """ Run 'configure' in a build directory unless it was configured the same way before.
+        Source changes after configuring are picked up by the generated Makefile rules
+        ('config.status --recheck'), a repeated run with identical arguments and environment is redundant.
 
     Parameters:
-        command (str): Linux shell command.
-        cwd (str): Working directory for the command.
-        env (str): Custom shell environment for the intermediate shell.
+        source_path (str): Path to source repository.
+        build_path (str): Path to build directory.
+        configure_args (list): 'configure' argument vector.
+        env (dict): Environment 'configure' is run with.
+        logfile (str): Log file, relative to build path, truncated in any case.
+        use_cache (bool): Use an autoconf cache file shared between build directories.
+
     Returns:
-        if executed process exit code is non-zero, raises a CalledProcessError.
+        none.
 
     """
-    print("[*] Running following command:")
-    print("'{0}' (cwd='{1}')".format( command, cwd))
 
-    # Some commands involve 'tee' (pipelines) hence prefix with 'pipefail' to capture failure as well
-    subprocess.run("set -o pipefail && {0}".format(command), cwd=cwd, env=env, check=True, shell=True,
-                    stderr=sys.stderr, stdout=sys.stdout, encoding="utf8")
+    stamp = configure_digest(source_path, configure_args, env)
+    stamp_path = os.path.join(build_path, CONFIGURE_STAMP_FILE)
+    try:
+        with open(stamp_path) as f:
+            if f.read().strip() == stamp and os.path.exists(os.path.join(build_path, "config.status")):
+                print("[*] Build directory '{0}' already configured the same way, skipping".format(build_path))
+                # start the log fresh as 'configure' would, the build steps append to it
+                open(os.path.join(build_path, logfile), 'wb').close()
+                return
+        # a failing run mustn't leave the stamp of a previous configuration behind
+        os.remove(stamp_path)
+    except FileNotFoundError:
+        pass
+
+    if use_cache:
+        configure_args = configure_args + ["--cache-file={0}".format(
+                                           configure_cache_file(configure_args, env))]
+    run_command(configure_args, build_path, env, logfile)
+    with open(stamp_path, 'w') as f:
+        f.write(stamp)
+
+def autoconf_stamp(source_path):
+    """ Compute a stamp of the source tree state relevant to 'autoreconf' and 'tools/make_requests'.
 
-def run_command_stdout(command, cwd=None, env=None):
-    """Run the specified command in a subprocess shell and return stdout
+    Parameters:
+        source_path (str): Path to source repository.
+
+    Returns:
+        Stamp as hex digest string.
+
+    """
+
+    # read HEAD without spawning 'git' if possible
+    head_commit = git_head_commit(source_path) or run_command_stdout(["git", "rev-parse", "HEAD"], source_path)
+    digest = hashlib.sha256(head_commit.encode())
+    for filename in AUTOCONF_STAMP_SOURCES:
+        try:
+            with open(os.path.join(source_path, filename), 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            # not all files exist in all Wine versions
+            pass
+    return digest.hexdigest()
+
+def fixup_patches(wine_version):
+    """ Select the build fixups needed for a Wine version from WINE_FIXUP_PATCHES.
 
     Parameters:
-        command (str): Linux shell command.
-        cwd (str): Working directory for the command.
-        env (str): Custom shell environment for the intermediate shell.
+        wine_version (Version): Wine version to build.
+
     Returns:
-        stdout as string
-        if executed process exit code is non-zero, raises a CalledProcessError.
+        list of (commit_id, binary) tuples, in order of application.
 
     """
-    print("[*] Running following command:")
-    print("'{0}' (cwd='{1}')".format( command, cwd))
 
-    # Some commands involve 'tee' (pipelines) hence prefix with 'pipefail' to capture failure as well
-    return subprocess.run("set -o pipefail && {0}".format(command), stdout=subprocess.PIPE,
-                        cwd=cwd, env=env, shell=True, encoding="utf8").stdout.rstrip(os.linesep)
+    return [(commit_id, binary) for commit_id, first_version, fixed_version, cherry_picked_versions, binary
+            in WINE_FIXUP_PATCHES
+            if (first_version is None or wine_version >= parse_version(first_version))
+            and (fixed_version is None or wine_version < parse_version(fixed_version))
+            and wine_version not in [parse_version(v) for v in cherry_picked_versions]]
+
+def format_patches(source_path, commit_ids, output_dir=None):
+    """ Extract patches from Git commits, using a single 'git format-patch' run.
 
-def patch_apply(source_path, commit_id, exclude_pattern=""):
+    Parameters:
+        source_path (str): Path to source repository.
+        commit_ids (list): Commit sha1s to generate patches from
+        output_dir (str): Directory for the patch files, default is the source repository
+
+    Returns:
+        dict of commit sha1 to path of patch file.
+
+    """
+
+    # a single revision would be taken as '<since>..HEAD' range, '-1' limits it to the commit itself
+    command = ["git", "format-patch", "--stdout", "--full-index", "--binary",
+               "-1" if len(commit_ids) == 1 else "--no-walk"] + list(commit_ids)
+    print("[*] Running following command:")
+    print("'{0}' (cwd='{1}')".format(" ".join(command), source_path))
+    mbox = subprocess.run(shell_command(command)[0], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          cwd=source_path).stdout
+
+    # Each patch starts with the magic 'From <sha1> Mon Sep 17 00:00:00 2001' line, the order of
+    # the patches in the output is not the order of the commits given.
+    patchfiles = {}
+    for patch in re.split(rb"^(?=From [0-9a-f]{40} Mon Sep 17 00:00:00 2001$)", mbox, flags=re.MULTILINE):
+        if not patch:
+            continue
+        commit_id = patch[5:45].decode()
+        patchfiles[commit_id] = os.path.join(output_dir or source_path, "{0}.patch".format(commit_id))
+        with open(patchfiles[commit_id], 'wb') as f:
+            f.write(patch)
+
+    for commit_id in commit_ids:
+        if commit_id not in patchfiles:
+            sys.exit("Patch extraction of '{0}' failed, aborting!".format(commit_id))
+    return patchfiles
+
+def patch_apply(source_path, commit_id, patchfile, exclude_pattern=""):
     """ Apply a patch from Git commit into current branch using 'patch' tool.
         The heuristics/fuzziness produces much better results with old Wine versions
         than any git merge strategy. Optionally exclude parts of the patch.
 
     Parameters:
         source_path (str): Path to source repository.
-        commit_id (str): Commit sha1 to generate patch from
+        commit_id (str): Commit sha1 the patch was generated from
+        patchfile (str): Patch extracted in advance by format_patches()
         exclude_pattern (str): Pattern for 'filterdiff' to exclude files
 
     Returns:
@@ -79,23 +1016,24 @@ def patch_apply(source_path, commit_id, exclude_pattern=""):
 
     """
 
-    # extract the patch from Git checkout
-    patchfile = run_command_stdout("git format-patch -1 --full-index --binary {0} 2> /dev/null".format(commit_id), source_path)
-    if not patchfile or not os.path.exists(os.path.normpath(os.path.join(source_path, patchfile))):
-        sys.exit("Patch extraction of '{0}' failed, aborting!".format(commit_id))
+    # custom builds (e.g. Git bisect) might already contain the fix
+    if commit_id in source_commits(source_path):
+        print("[*] Commit '{0}' is already part of source tree, skipping".format(commit_id))
+        return
 
-    patch_stdout = run_command_stdout("filterdiff -p1 -x '{0}' < {1} | patch -p1 --forward --no-backup-if-mismatch 2>&1".format(
-                 exclude_pattern, patchfile), source_path)
-    if any(re.findall(r'failed|error:', patch_stdout, re.IGNORECASE)):
+    patch_stdout = run_pipeline_stdout([["filterdiff", "-p1", "-x", exclude_pattern, patchfile],
+                 ["patch", "-p1", "--forward", "--no-backup-if-mismatch"]], source_path)
+    if PATCH_ERROR_RE.search(patch_stdout):
         sys.exit("Patch '{0}' failed with output '{1}', aborting!".format(patchfile, patch_stdout))
     # "Reversed (or previously applied) patch detected!  Skipping patch." is not an error
 
-def bin_patch_apply(source_path, commit_id, exclude_pattern=""):
+def bin_patch_apply(source_path, commit_id, patchfile, exclude_pattern=""):
     """ Apply a binary patch from Git commit into current branch using 'git apply'.
 
     Parameters:
         source_path (str): Path to source repository.
-        commit_id (str): Commit sha1 to generate patch from
+        commit_id (str): Commit sha1 the patch was generated from
+        patchfile (str): Patch extracted in advance by format_patches()
         exclude_pattern (str): Pattern for 'filterdiff' to exclude files
 
     Returns:
@@ -103,47 +1041,90 @@ def bin_patch_apply(source_path, commit_id, exclude_pattern=""):
 
     """
 
-    # extract the patch from Git checkout
-    patchfile = run_command_stdout("git format-patch -1 --full-index --binary {0} 2> /dev/null".format(commit_id), source_path)
-    if not patchfile or not os.path.exists(os.path.normpath(os.path.join(source_path, patchfile))):
-        sys.exit("Patch extraction of '{0}' failed, aborting!".format(commit_id))
+    # custom builds (e.g. Git bisect) might already contain the fix
+    if commit_id in source_commits(source_path):
+        print("[*] Commit '{0}' is already part of source tree, skipping".format(commit_id))
+        return
 
-    patch_stdout = run_command_stdout("filterdiff -p1 -x '{0}' < {1} | git apply 2>&1".format(
-                 exclude_pattern, patchfile), source_path)
-    if any(re.findall(r'not apply|error:', patch_stdout, re.IGNORECASE)):
+    patch_stdout = run_pipeline_stdout([["filterdiff", "-p1", "-x", exclude_pattern, patchfile],
+                 ["git", "apply"]], source_path)
+    if GIT_APPLY_ERROR_RE.search(patch_stdout):
         sys.exit("Git apply '{0}' failed with output '{1}', aborting!".format(patchfile, patch_stdout))
     # "Reversed (or previously applied) patch detected!  Skipping patch." is not an error
 
+def install_pdbs(build_path, install_dir):
+    """ Copy the PDB files from a build tree into an install directory, in-process without 'find'/'cp'.
+
+    Parameters:
+        build_path (str): Path to build tree, searched recursively.
+        install_dir (str): Destination directory, all PDB files are copied into it directly.
+
+    Returns:
+        none.
+
+    """
+
+    print("[*] Copying PDB files from '{0}' to '{1}'".format(build_path, install_dir))
+    for root, dirs, files in os.walk(build_path):
+        for name in files:
+            if name.endswith(".pdb"):
+                print("'{0}' -> '{1}'".format(os.path.join(root, name), os.path.join(install_dir, name)))
+                shutil.copy(os.path.join(root, name), install_dir)
+
+@functools.lru_cache(maxsize=None)
 def create_config_wrapper(org_config, arg_filter, output_remove):
-    """ Create a shell wrapper in /tmp for pkg-config, freetype-config etc. to fix broken cflags.
+    """ Create a shell wrapper in the user cache directory for pkg-config, freetype-config etc. to fix broken cflags.
+        An identical wrapper from a previous run is reused.
 
     Parameters:
         org_config (str): Path to original pkg-config, freetype-config etc.
         arg_filter (str): Argument pattern to filter output for.
-        output_replace (str): Output pattern to remove.
+        output_remove (str): Output pattern to remove.
 
     Returns:
         Full path to new config wrapper script.
 
     """
 
-    content = """#!/bin/bash
+    # POSIX shell script, starts faster than bash and needs no further processes:
+    # - calls not matching the filter replace the wrapper process with the original tool ('exec')
+    # - the pattern is removed with parameter expansion instead of piping through 'sed'
+    content = """#!/bin/sh
+case " $* " in
+  *"{arg_filter}"*) ;;
+  *) exec {org_config} "$@" ;;
+esac
 result=`{org_config} "$@"`
-if [[ "$@" =~ "{arg_filter}" ]] ; then
-  echo "${{result//{output_remove}/}}"
-else
-  echo "$result"
-fi
+status=$?
+while case "$result" in *"{output_remove}"*) true ;; *) false ;; esac ; do
+  result="${{result%%"{output_remove}"*}}${{result#*"{output_remove}"}}"
+done
+echo "$result"
+exit $status
 """.format( org_config=org_config, arg_filter=arg_filter, output_remove=output_remove)
 
-    # Create the wrapper in /tmp/<random>/<org_config> to ensure uniqueness but same basename.
+    # Create the wrapper in <cache>/wrapper-<content hash>/<org_config> to ensure uniqueness but same basename.
+    # The path is stable across runs, it ends up in the 'configure' environment (configure_digest()).
     # It also supports nested 'pkg-config' use-cases. Each created wrapper can call the previous wrapper
     # which at one point calls the original 'pkg-config' from first created wrapper (in sequence).
     # Each wrapper would filter out it's own pattern.
-    config_wrapper = os.path.join(tempfile.mkdtemp(), os.path.basename(org_config))
-    with open(config_wrapper, 'w') as f:
+    wrapper_dir = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "buildwine",
+                               "wrapper-{0}".format(hashlib.sha256(content.encode()).hexdigest()[:16]))
+    config_wrapper = os.path.join(wrapper_dir, os.path.basename(org_config))
+    try:
+        with open(config_wrapper) as f:
+            if f.read() == content and os.access(config_wrapper, os.X_OK):
+                return config_wrapper
+    except FileNotFoundError:
+        pass
+
+    # write to a temporary file first to never leave a truncated wrapper behind
+    os.makedirs(wrapper_dir, exist_ok=True)
+    config_wrapper_tmp = "{0}.{1}".format(config_wrapper, os.getpid())
+    with open(config_wrapper_tmp, 'w') as f:
         f.write( content)
-    os.chmod(config_wrapper, os.stat(config_wrapper).st_mode | stat.S_IEXEC)
+    os.chmod(config_wrapper_tmp, os.stat(config_wrapper_tmp).st_mode | stat.S_IEXEC)
+    os.replace(config_wrapper_tmp, config_wrapper)
     return config_wrapper
 
 def main():
@@ -157,12 +1138,12 @@ def main():
     # source path
     my_parser.add_argument("--source-path",
                            type=str,
-                           default="{0}/mainline-src".format(wine_workspace_path),
+                           default=workspace_dir(wine_workspace_path, "mainline-src"),
                            help="specify the Wine source path (git checkout)")
     # install prefix
     my_parser.add_argument("--install-prefix",
                            type=str,
-                           default="{0}/mainline-install".format(wine_workspace_path),
+                           default=workspace_dir(wine_workspace_path, "mainline-install"),
                            help="specify the Wine install path")
     # default Wine variant: mainline
     my_parser.add_argument("--variant",
@@ -175,11 +1156,14 @@ def main():
                            type=str,
                            default="",
                            help="specify the Wine version, should be a valid Wine tag: <major>.<minor>")
-    # default number of build jobs
+    # default number of build jobs: one extra job to overlap I/O waits
     my_parser.add_argument("--jobs",
                            type=int,
-                           default=os.cpu_count(),
+                           default=available_cpus() + 1,
                            help="specify the default number of CPU cores used for building Wine")
+    my_parser.add_argument("--load-average",
+                           type=float,
+                           help="don't start new build jobs if the system load average is above the given value")
     # default cross-toolchain: none -> native host toolchain
     my_parser.add_argument("--cross-compile-prefix",
                            type=str,
@@ -188,6 +1172,9 @@ def main():
     my_parser.add_argument("--enable-clang",
                            action="store_true",
                            help="Use the clang for building Wine")
+    my_parser.add_argument("--no-ccache",
+                           action="store_true",
+                           help="don't use ccache for building Wine, even if available")
     my_parser.add_argument("--disable-mingw",
                            action="store_true",
                            help="do not use the MinGW cross-compiler for building Wine")
@@ -200,9 +1187,12 @@ def main():
     my_parser.add_argument("--enable-nopic",
                            action="store_true",
                            help="disable building of Wine with position-independent code (PIC), Wine 4.8+ default")
+    my_parser.add_argument("--enable-lto",
+                           action="store_true",
+                           help="use ThinLTO for the host (ELF) parts of Wine, requires '--enable-clang'")
     my_parser.add_argument("--force-autoconf",
                            action="store_true",
-                           help="run autoreconf and tools/make_requests all the time")
+                           help="run autoreconf and tools/make_requests whenever the source tree changed since the last run")
     my_parser.add_argument("--clean",
                            action="store_true",
                            help="remove build and install directories")
@@ -216,6 +1206,20 @@ def main():
     my_parser.add_argument("--configure-only",
                            action="store_true",
                            help="do not build, run Wine 'configure' step only. ")
+    my_parser.add_argument("--tools-only",
+                           action="store_true",
+                           help="build the Wine host tools only, as needed by cross-compile builds ('--with-wine-tools')")
+    my_parser.add_argument("--configure-cache",
+                           action="store_true",
+                           help="reuse 'configure' test results across builds with the same toolchain "
+                                "(remove ~/.cache/buildwine after installing development packages)")
+    my_parser.add_argument("--full-clone",
+                           action="store_true",
+                           help="create the local mainline Git mirror with all file contents instead of fetching them "
+                                "on demand (for offline work)")
+    my_parser.add_argument("--parallel-archs",
+                           action="store_true",
+                           help="build 64-bit and 32-bit Wine concurrently, sharing the job slots (GNU Make 4.2+)")
 
     args = my_parser.parse_args()
 
@@ -230,57 +1234,64 @@ def main():
     # set up various paths for variants: mainline, staging and custom
 
     # source paths
-    wine_mainline_source_path = "{0}/mainline-src{1}".format(wine_workspace_path, dash_version)
-    wine_variant_source_path = "{0}/{1}-src{2}".format(wine_workspace_path, args.variant, dash_version)
-    wine_staging_patches_path = "{0}/staging-patches{1}".format(wine_workspace_path, dash_version)
+    wine_mainline_source_path = workspace_dir(wine_workspace_path, "mainline-src", dash_version)
+    wine_variant_source_path = workspace_dir(wine_workspace_path, "{0}-src".format(args.variant), dash_version)
+    wine_staging_patches_path = workspace_dir(wine_workspace_path, "staging-patches", dash_version)
+    # build and install directory base names, completed with version and target arch below
+    wine_build_dir_name = "{0}-build".format(args.variant)
+    wine_install_dir_name = "{0}-install".format(args.variant)
+
+    # probe results are constant for a given host/toolchain/commit, cache them across runs
+    probe_cache_path = os.path.join(wine_workspace_path, PROBE_CACHE_FILE)
 
     ##################################################################
     # version/release handling part #2
     if args.version:
         # check if version is exists
-        stdout = run_command_stdout("git describe --abbrev=0 wine-{0} 2> /dev/null | sed 's/wine-//'".format(args.version),
-                            "{0}/{1}-src".format(wine_workspace_path, args.variant))
+        stdout = describe_version(probe_cache_path, workspace_dir(wine_workspace_path, "{0}-src".format(args.variant)),
+                                  "wine-{0}".format(args.version))
         wine_version = parse_version(stdout)
-        if not isinstance(wine_version, Version):
+        if wine_version is None:
             sys.exit("Unknown Wine version '{0}', aborting!".format(args.version))
     else:
         # no version given but we need one to apply fixups on custom builds
-        stdout = run_command_stdout("git describe --abbrev=0 2> /dev/null | sed 's/wine-//'",
-                            wine_variant_source_path)
+        stdout = describe_version(probe_cache_path, wine_variant_source_path)
         wine_version = parse_version(stdout)
+        if wine_version is None:
+            sys.exit("Unable to determine Wine version of '{0}', aborting!".format(wine_variant_source_path))
 
     # for exporting variables into current shell environment
-    my_env = dict(os.environ.copy())
+    my_env = os.environ.copy()
 
     ##################################################################
     # default options passed to 'configure'
-    configure_options = ""
+    configure_options = []
     # LLVM-based MinGW integration and PDB support is usable since Wine 5.0
     # Configure fixup required for newer LLVM MinGW 12.x doesn't apply cleanly hence exclude Wine 5.0, 5.1
     # GIT: https://source.winehq.org/git/wine.git/commitdiff/f29d4a43e203303c2d4aaec388f281d01f17764c
-    if wine_version <= Version("5.1"):
+    if wine_version <= parse_version("5.1"):
         args.disable_mingw = True
     # MinGW cross-compiler option '--with-mingw' was added with Wine 4.6
-    if wine_version >= Version("4.6"):
-        configure_options += " --without-mingw" if args.disable_mingw else " --with-mingw"
+    if wine_version >= parse_version("4.6"):
+        configure_options.append("--without-mingw" if args.disable_mingw else "--with-mingw")
     # - Wine-Mono disabled by default on HEAD builds (no explicit version given)
-    configure_options += " --enable-mscoree" if args.enable_mscoree or args.version else " --disable-mscoree"
+    configure_options.append("--enable-mscoree" if args.enable_mscoree or args.version else "--disable-mscoree")
     # - Tests not built by default
-    configure_options += " --enable-tests" if args.enable_tests else " --disable-tests"
+    configure_options.append("--enable-tests" if args.enable_tests else "--disable-tests")
     # NOTE: 'configure --enable-modulename ' will cause: 'configure:num: WARNING: unrecognized options: --enable-modulename'
     # GIT: https://source.winehq.org/git/wine.git/commitdiff/d92bcec95a55bae2f9bc686bad9b2641a162c548
     # FIXED: wine-1.7.4
 
     ##################################################################
     # default host and target machine architectures
-    wine_host_arch64 = run_command_stdout("setarch linux64 uname -m")
-    wine_host_arch32 = run_command_stdout("setarch linux32 uname -m")
+    wine_host_arch64 = host_arch(probe_cache_path, "linux64")
+    wine_host_arch32 = host_arch(probe_cache_path, "linux32")
     # Default: no cross-compile -> target == host arch
     wine_target_arch64 = wine_host_arch64
     wine_target_arch32 = wine_host_arch32
 
     # Since Wine 6.8, libraries are installed into architecture-specific subdirectories.
-    if wine_version >= Version("6.8"):
+    if wine_version >= parse_version("6.8"):
         wine_install_arch32_pe_dir = "lib/wine/i386-windows"
         wine_install_arch32_so_dir = "lib/wine/i386-unix"
         wine_install_arch64_pe_dir = "lib/wine/x86_64-windows"
@@ -293,18 +1304,17 @@ def main():
 
     ##################################################################
     # cross-compile setup
-    wine_cross_compile_options = ""
+    wine_cross_compile_options = []
     if args.cross_compile_prefix:
 
-        wine_cross_compile_options += " --host={0} host_alias={1}".format(
-            args.cross_compile_prefix.rstrip("-"), args.cross_compile_prefix.rstrip("-"))
+        wine_cross_compile_options += ["--host={0}".format(args.cross_compile_prefix.rstrip("-")),
+                                       "host_alias={0}".format(args.cross_compile_prefix.rstrip("-"))]
         # Need to set '--with-wine-tools' when cross compiling.
         # The path must point the tools subdirectory of a wine build compiled for the *host* system.
-        wine_cross_compile_options += " --with-wine-tools={0}/{1}-build{2}-{3}".format(
-            wine_workspace_path, args.variant, dash_version, wine_host_arch64)
+        wine_cross_compile_options.append("--with-wine-tools={0}".format(workspace_dir(
+            wine_workspace_path, wine_build_dir_name, dash_version, wine_host_arch64)))
 
-        wine_target_arch = run_command_stdout("{0}gcc -dumpmachine | cut -d '-' -f1 2>&1".format(
-                                args.cross_compile_prefix))
+        wine_target_arch = cross_target_arch(probe_cache_path, args.cross_compile_prefix)
 
         if "arm" in wine_target_arch:
             wine_target_arch32 = wine_target_arch
@@ -313,11 +1323,20 @@ def main():
             wine_install_arch32_so_dir = "/arm-unix"
             # On 32-bit ARM, the floating point ABI defaults to 'softfp' for compatibility
             # with Windows binaries. This won't work for hardfp toolchains.
-            cc_opt_floatabi = run_command_stdout(r"$CC -Q --help=target | grep -m1 -oP '\bmfloat-abi=\s+\K\w+'")
-            cc_opt_fpu = run_command_stdout(r"$CC -Q --help=target | grep -m1 -oP '\bmfpu=\s+\K\w+'")
-            cc_opt_arch = run_command_stdout(r"$CC -Q --help=target | grep -m1 -oP '\bmarch=\s+\K\w+'")
-
-            wine_cross_compile_options += " --with-float-abi={0}".format(cc_opt_floatabi)
+            # Query the target options once and extract the values in Python (no 'grep' pipelines)
+            cc_target_help = compiler_target_help(probe_cache_path, my_env.get("CC", "{0}gcc".format(
+                                args.cross_compile_prefix)))
+            cc_target_opts = {}
+            for option in ("mfloat-abi", "mfpu", "march"):
+                match = re.search(r"\b{0}=\s+(\w+)".format(option), cc_target_help)
+                if not match:
+                    sys.exit("Failed to determine '-{0}' default of the cross-compiler, aborting!".format(option))
+                cc_target_opts[option] = match.group(1)
+            cc_opt_floatabi = cc_target_opts["mfloat-abi"]
+            cc_opt_fpu = cc_target_opts["mfpu"]
+            cc_opt_arch = cc_target_opts["march"]
+
+            wine_cross_compile_options.append("--with-float-abi={0}".format(cc_opt_floatabi))
             my_env["EXTRA_TARGETFLAGS"] = "-march={0} -mfpu={1}".format(cc_opt_arch, cc_opt_fpu)
 
         elif "aarch64" in wine_target_arch:
@@ -333,12 +1352,16 @@ def main():
     my_env["PKG_CONFIG"] = shutil.which("pkg-config")
 
     # common CFLAGS
-    wine_cflags_common = "-O2 -g"
+    # - '-pipe' avoids temporary files between compiler and assembler
+    # - '-fno-semantic-interposition' allows inlining of exported functions within the same shared library
+    wine_cflags_common = "-O2 -g -pipe -fno-semantic-interposition"
     # Wine 6.21 added dwarf4 debug format support in dbghelp
-    if wine_version >= Version("6.21"):
+    if wine_version >= parse_version("6.21"):
         wine_cflags_common += " -gdwarf-4"
 
     # Set up target arch specific CFLAGS which are not cross-compile dependent
+    # NOTE: one of the target archs is empty when cross-compiling, never both
+    assert wine_target_arch32 or wine_target_arch64
     wine_cflags_target_arch64 = ""
     wine_cflags_target_arch32 = ""
 
@@ -354,6 +1377,27 @@ def main():
         my_env["CC"] =  os.getenv('CLANGCC', 'clang')
         my_env["CPP"] = os.getenv('CLANGCPP', 'clang -E')
 
+        if args.enable_lto:
+            # ThinLTO keeps link times and memory usage scalable compared to full LTO
+            wine_cflags_common += " -flto=thin"
+            my_env["LDFLAGS"] = "{0} -flto=thin".format(my_env.get("LDFLAGS", "")).strip()
+
+    elif args.enable_lto:
+        sys.exit("LTO requires '--enable-clang', aborting!")
+
+    # Use ccache if available, compiler output is reused across rebuilds and variants of the same version
+    wine_use_ccache = not args.no_ccache and shutil.which("ccache") is not None
+    if wine_use_ccache:
+        for cc_var, cc_default in [("CC", "gcc"), ("CXX", "g++")]:
+            # cross-compile environments such as Yocto SDK set their own compiler variables
+            cc_default = "{0}{1}".format(args.cross_compile_prefix, cc_default)
+            if not my_env.get(cc_var, "").startswith("ccache "):
+                my_env[cc_var] = "ccache {0}".format(my_env.get(cc_var, cc_default))
+        # relative paths below the workspace root make the sources of all variants hash the same
+        my_env.setdefault("CCACHE_BASEDIR", wine_workspace_path)
+        # __DATE__/__TIME__ users would otherwise never be cached
+        my_env.setdefault("CCACHE_SLOPPINESS", "time_macros")
+
     if "aarch64" in wine_target_arch64:
         # Wine bug #38719: https://bugs.winehq.org/show_bug.cgi?id=38719
         # 64-bit ARM Windows applications from Windows SDK for Windows 10 crash when accessing TEB/PEB members
@@ -362,27 +1406,25 @@ def main():
 
     elif "x86_64" in wine_target_arch64:
         if args.enable_nopic:
-            wine_cflags_target_arch64 = "-fno-PIC -mcmodel=large"
+            # '-fno-plt' calls external functions through the GOT directly, saving the PLT indirection
+            wine_cflags_target_arch64 = "-fno-PIC -mcmodel=large -fno-plt"
 
-    if "i386" or "i686" in wine_target_arch32:
+    if wine_target_arch32 in ("i386", "i686"):
         if args.enable_nopic:
             wine_cflags_target_arch32 = "-fno-PIC"
 
     if not args.disable_mingw:
         # LLVM based MinGW toolchain settings (https://github.com/mstorsjo/llvm-mingw)
-        # - enable ASLR support
-        # Currently not supported by Wine loader: https://bugs.winehq.org/show_bug.cgi?id=48417
-        my_env["CROSSLDFLAGS"] = " -Wl,--dynamicbase"
         # - generate debug symbols in PDB format
         # GIT: https://source.winehq.org/git/wine.git/commit/83d00d328f58f910a9b197e0a465b110cbdc727c
-        if wine_version >= Version("5.9"):
+        if wine_version >= parse_version("5.9"):
             # Support split debug for cross compiled modules
             my_env["CROSSDEBUG"] = "pdb"
+            # - enable ASLR support
+            # Currently not supported by Wine loader: https://bugs.winehq.org/show_bug.cgi?id=48417
+            my_env["CROSSLDFLAGS"] = " -Wl,--dynamicbase"
         else:
             my_env["CROSSCFLAGS"] = "-g -gcodeview -O2"
-            # Wine 6.21 added dwarf4 debug format support in dbghelp
-            if wine_version >= Version("6.21"):
-                my_env["CROSSCFLAGS"] = "-gdwarf-4 -O2"
             my_env["CROSSLDFLAGS"] = "-Wl,-pdb="
         # Use clang MSVC mode to emit 'movl %edi,%edi' prologue
         # https://github.com/llvm/llvm-project/blob/main/llvm/lib/Target/X86/X86MCInstLower.cpp#L1386
@@ -396,9 +1438,13 @@ def main():
         #
         # GIT: https://source.winehq.org/git/wine.git/commitdiff/4b362d016c57c14570efeb9c38dfcc5cf2c0910d
         # FIXED: Wine 6.0
-        if wine_version >= Version("6.0"):
+        if wine_version >= parse_version("6.0"):
             my_env["CROSSCC"] = "clang"
 
+        # the MinGW cross-compiler is only wrapped if set explicitly, otherwise 'configure' probes for it
+        if wine_use_ccache and my_env.get("CROSSCC") and not my_env["CROSSCC"].startswith("ccache "):
+            my_env["CROSSCC"] = "ccache {0}".format(my_env["CROSSCC"])
+
     # target arch specific build and install paths
     wine_build_target_arch32_path = ""
     wine_build_target_arch64_path = ""
@@ -406,394 +1452,171 @@ def main():
 
     # target arch specific paths for 32-bit Wine
     if wine_target_arch32:
-        wine_build_target_arch32_path = "{0}/{1}-build{2}-{3}".format(
-            wine_workspace_path, args.variant, dash_version, wine_target_arch32)
-        wine_install_prefix = "{0}/{1}-install{2}-{3}".format(
-            wine_workspace_path, args.variant, dash_version, wine_target_arch32)
+        wine_build_target_arch32_path = workspace_dir(
+            wine_workspace_path, wine_build_dir_name, dash_version, wine_target_arch32)
+        wine_install_prefix = workspace_dir(
+            wine_workspace_path, wine_install_dir_name, dash_version, wine_target_arch32)
     # target arch specific paths for 64-bit Wine
     if wine_target_arch64:
-        wine_build_target_arch64_path = "{0}/{1}-build{2}-{3}".format(
-            wine_workspace_path, args.variant, dash_version, wine_target_arch64)
+        wine_build_target_arch64_path = workspace_dir(
+            wine_workspace_path, wine_build_dir_name, dash_version, wine_target_arch64)
         # includes shared WoW64 install as well
-        wine_install_prefix = "{0}/{1}-install{2}-{3}".format(
-            wine_workspace_path, args.variant, dash_version, wine_target_arch64)
+        wine_install_prefix = workspace_dir(
+            wine_workspace_path, wine_install_dir_name, dash_version, wine_target_arch64)
+
+    # host tools are built in the 64-bit build tree only, the 32-bit build would use them as well
+    # 32-bit hosts have no 64-bit build tree, the tools are built in the 32-bit one then
+    if args.tools_only:
+        if args.cross_compile_prefix:
+            sys.exit("Wine host tools can't be built with a cross-toolchain, aborting!")
+        if wine_build_target_arch64_path:
+            wine_build_target_arch32_path = ""
+
+    ##################################################################
+    # Wine-Staging: clone/update the patches repository concurrently with the mainline source tree setup,
+    # both are network-bound and independent of each other
+    staging_patches_future = None
+    if args.variant == "staging":
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # A specific version only needs its tag, a shallow clone of it is sufficient and tags don't move,
+        # no updates needed. Otherwise treeless partial clone, trees and blobs are fetched on demand
+        # for the checked out version only.
+        if args.version:
+            staging_patches_future = executor.submit(ensure_repo, WINE_STAGING_GIT_URI, wine_staging_patches_path,
+                                                     ["--depth=1", "--branch", "v{0}".format(args.version)], None)
+        else:
+            # only the upstream branch is needed for resetting the clone, tags aren't used
+            staging_patches_future = executor.submit(ensure_repo, WINE_STAGING_GIT_URI, wine_staging_patches_path,
+                                                     ["--filter=tree:0", "-c", "fetch.negotiationAlgorithm=skipping"],
+                                                     ["origin", "--prune", "--no-tags"])
+        # no further work, the worker thread finishes with the submitted one
+        executor.shutdown(wait=False)
 
     ##################################################################
     # Set up mainline source tree clone. It also needs to be present for Wine-Staging.
+    wine_mainline_source_cloned = False
     if not os.path.exists(wine_mainline_source_path):
 
         # local git mirror to speed up checkout and save disk space
-        wine_local_clone_source = "{0}/mainline-src-reference-gitmirror".format(wine_workspace_path)
-        if not os.path.exists(wine_local_clone_source):
-            # create local git mirror for the first time
-            run_command("git clone --mirror {0} {1}".format(WINE_MAINLINE_GIT_URI, wine_local_clone_source))
+        wine_local_clone_source = workspace_dir(wine_workspace_path, "mainline-src-reference-gitmirror")
+        # create local git mirror for the first time
+        # blobless partial mirror by default, file contents are fetched on demand for checked out versions only
+        # - skipping negotiation needs fewer round trips for updates of a mirror far behind upstream
+        # - the 'manyFiles' index settings apply to the worktrees of the mirror as well
+        # ensure an existing local git mirror is up to date, drop refs deleted upstream
+        # tags are part of the mirror refspec, no need for automatic tag following
+        # a partial mirror applies its filter to the fetch as well
+        ensure_repo(WINE_MAINLINE_GIT_URI, wine_local_clone_source,
+                    ["--mirror", "-c", "fetch.negotiationAlgorithm=skipping", "-c", "feature.manyFiles=true"]
+                    + ([] if args.full_clone else ["--filter=blob:none"]), ["origin", "--prune", "--no-tags"])
+
+        if args.full_clone:
+            # use '--shared' to speed up checkout and save disk space
+            # use '--no-checkout' to populate the working tree only once, at the requested version
+            run_command(["git", "clone", "--shared", "--no-checkout", wine_local_clone_source,
+                        wine_mainline_source_path])
+            run_command(["git", "reset", "--hard", "wine-{0}".format(args.version) if args.version else "HEAD"],
+                        wine_mainline_source_path)
         else:
-            # ensure local git mirror is up to date
-            run_command("git fetch --all || true", cwd=wine_local_clone_source)
-
-        # use '--shared' to speed up checkout and save disk space
-        run_command("git clone --shared {0} {1}".format(wine_local_clone_source, wine_mainline_source_path))
-
-    # reset mainline source tree when version has been specified
-    if args.version and args.variant != "staging" and not args.no_reset_source:
+            # Missing blobs can only be fetched by repositories sharing the promisor remote configuration
+            # of the partial mirror, a worktree does, a '--shared' clone doesn't.
+            run_command(["git", "-C", wine_local_clone_source, "worktree", "add", "-f", "--detach",
+                        wine_mainline_source_path, "wine-{0}".format(args.version) if args.version else "HEAD"])
+        wine_mainline_source_cloned = True
+
+    # reset mainline source tree when version has been specified (fresh clones are already there)
+    if args.version and args.variant != "staging" and not args.no_reset_source and not wine_mainline_source_cloned:
         # reset the tree to specific version
-        run_command("git reset --hard wine-{0}".format(args.version), wine_mainline_source_path)
+        run_command(["git", "reset", "--hard", "wine-{0}".format(args.version)], wine_mainline_source_path)
         # removed any untracked files
-        run_command("git clean -dxf", wine_mainline_source_path)
+        # build artifacts live in separate build directories, no need to walk the ignored files ('-x')
+        run_command(["git", "clean", "-df"], wine_mainline_source_path)
 
     ##################################################################
     # Wine-Staging: set up two source source tree: upstream repo + mainline-patched-with-staging
     if args.variant == "staging":
 
-        if not os.path.exists(wine_staging_patches_path):
-            run_command("git clone {0} {1}".format(WINE_STAGING_GIT_URI, wine_staging_patches_path))
-        else:
-            run_command("git fetch --all || true", cwd=wine_staging_patches_path)
+        # wait for the patches repository, re-raises a failed clone
+        wine_staging_patches_cloned = staging_patches_future.result()
 
+        wine_variant_source_created = False
         if not os.path.exists(wine_variant_source_path):
-            run_command("git clone {0} {1}".format(wine_mainline_source_path, wine_variant_source_path))
-        else:
-            run_command("git fetch --all || true", cwd=wine_variant_source_path)
-
+            # A worktree of the mainline source tree shares its object store and refs, no second clone needed.
+            # It's detached since the mainline source tree might have the same branch checked out.
+            try:
+                run_command(["git", "-C", wine_mainline_source_path, "worktree", "add", "-f", "--detach",
+                            wine_variant_source_path, "wine-{0}".format(args.version) if args.version else "master"])
+                wine_variant_source_created = True
+            except subprocess.CalledProcessError:
+                # e.g. Git too old for worktrees, fall back to a clone sharing the object store
+                run_command(["git", "clone", "--shared", wine_mainline_source_path, wine_variant_source_path])
+        elif not is_git_worktree(wine_variant_source_path):
+            # source tree cloned from mainline source tree, worktrees share the refs already
+            run_command(["git", "fetch", "--all"], cwd=wine_variant_source_path, check=False)
+
+        # fresh clones and worktrees are already checked out at the requested version, no reset needed
         if not args.no_reset_source:
             if args.version:
                 # reset source tree to specific version
-                run_command("git reset --hard v{0}".format(args.version), wine_staging_patches_path)
+                if not wine_staging_patches_cloned:
+                    run_command(["git", "reset", "--hard", "v{0}".format(args.version)], wine_staging_patches_path)
                 # reset source tree to specific version
-                run_command("git reset --hard wine-{0}".format(args.version), wine_variant_source_path)
+                if not wine_variant_source_created:
+                    run_command(["git", "reset", "--hard", "wine-{0}".format(args.version)], wine_variant_source_path)
             else:
                 # reset source tree to where upstream points to
-                run_command("git reset --hard @{upstream}", wine_staging_patches_path)
+                if not wine_staging_patches_cloned:
+                    run_command(["git", "reset", "--hard", "@{upstream}"], wine_staging_patches_path)
                 # reset source tree to where upstream points to
-                run_command("git reset --hard @{upstream}", wine_variant_source_path)
+                # detached worktrees have no upstream, use the mainline branch a clone would track
+                if not wine_variant_source_created:
+                    run_command(["git", "reset", "--hard", "master" if is_git_worktree(wine_variant_source_path)
+                                else "@{upstream}"], wine_variant_source_path)
 
         # apply staging patches to the clone
-        run_command("{0}/staging/patchinstall.py DESTDIR={1} --backend=git-apply --all".format(
-            wine_staging_patches_path, wine_variant_source_path))
+        # NOTE: patchinstall resolves dependencies between patchsets and regenerates autoconf/make_requests
+        # results for patches touching them. Feeding its patches to a single 'git am' would bypass that.
+        # 'git-apply' backend only touches the working tree, HEAD doesn't move. Collect the source tree
+        # commits needed by the build fixups below concurrently with the lengthy patch application,
+        # only for versions that have fixups, the history walk is wasted otherwise.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            if fixup_patches(wine_version):
+                executor.submit(source_commits, wine_variant_source_path)
+            run_command(["{0}/staging/patchinstall.py".format(wine_staging_patches_path),
+                "DESTDIR={0}".format(wine_variant_source_path), "--backend=git-apply", "--all"])
 
     ##################################################################
     # apply Wine build fixups for older Wine versions
-
-    # ERROR: tools/wrc/parser.y:2840:15: error: ‘YYLEX’ undeclared (first use in this function)
-    #        and various other locations with problematic bison directives
-    # URL: https://bugs.winehq.org/show_bug.cgi?id=34329
-    # GIT: https://source.winehq.org/git/wine.git/commit/8fcac3b2bb8ce4cdbcffc126df779bf1be168882
-    # FIXED: wine-1.7.0
-    if wine_version >= Version("1.3.28") and wine_version < Version("1.7.0"):
-        # stable >= 1.6.1 already has cherry-pick as 572f97b1add2731ed6f14e2eea1ed5db2b1071dd
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "3f98185fb8f88c181877e909ab1b6422fb9bca1e")
-        # stable >= 1.6.1 already has cherry-pick as 6ac684f25e12e3f490437dd101ad8150d43f43bf
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "8fcac3b2bb8ce4cdbcffc126df779bf1be168882")
-        # stable >= 1.6.1 already has cherry-pick as db04cfc20d950d0e6e46f55d314b8f763b56e79a
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "bda5a2ffb833b2824325bd9361b30dbaf5f78068")
-    # jscript: https://source.winehq.org/git/wine.git/commitdiff/9ebdd111264cfa646dd5219b5874166eb59217c1
-    if wine_version >= Version("1.1.10") and wine_version < Version("1.7.0"):
-        # stable >= 1.6.1 already has cherry-pick as 2516f6d5bfb6e9395bfa98ccad9bad6e17bd82fa
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "ffbe1ca986bd299e1fc894440849914378adbf5c")
-    # vbscript: https://source.winehq.org/git/wine.git/commitdiff/80bcaf8d7ba68aea7090cac2a18e4e7a13147e88
-    if wine_version >= Version("1.3.28") and wine_version < Version("1.7.0"):
-        # stable >= 1.6.1 already has cherry-pick as 8002ba95867c1f653635b23612c3136a7c899ab0
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "f86c46f6403fe338a544ab134bdf563c5b0934ae")
-    # wbemprox: https://source.winehq.org/git/wine.git/commitdiff/f6be21103b441180c8557aa6bc2845e5428271a4
-    if wine_version >= Version("1.5.7") and wine_version < Version("1.7.0"):
-        # stable >= 1.6.1 already has cherry-pick as 98b1b7a89c175dee4f02e40b67f7435d765942c5
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "c14e322a92a24e704836c5c12207c694a30e805f")
-
-    # ERROR: err:msidb:get_tablecolumns column 1 out of range (gcc 4.9+ problem, breaks msi installers)
-    # URL: https://bugs.winehq.org/show_bug.cgi?id=36139
-    # GIT: https://source.winehq.org/git/wine.git/commit/deb274226783ab886bdb44876944e156757efe2b
-    # FIXED: wine-1.7.20
-    # NOTE: wine-1.3.22 reformatted code: 'maxcount*sizeof(*colinfo)' -> 'maxcount * sizeof(*colinfo)'
-    # https://source.winehq.org/git/wine.git/commitdiff/1ae309f98194f56b3734943cd63d8a798319fb34
-    if wine_version >= Version("1.3.28") and wine_version < Version("1.7.20"):
-        patch_apply(wine_variant_source_path, "deb274226783ab886bdb44876944e156757efe2b")
+    wine_fixup_patches = [(commit_id, binary) for commit_id, binary in fixup_patches(wine_version)
+                          if commit_id not in source_commits(wine_variant_source_path)]
+    if wine_fixup_patches:
+        # all patches are extracted at once, applying them must be done in order
+        # NOTE: Patches are applied one by one on purpose. A combined 'patch' run can't mix in the binary
+        # patches which need 'git apply', and a failure couldn't be attributed to the fixup commit.
+        with tempfile.TemporaryDirectory() as patch_dir:
+            patchfiles = format_patches(wine_variant_source_path,
+                                        [commit_id for commit_id, binary in wine_fixup_patches], patch_dir)
+            for commit_id, binary in wine_fixup_patches:
+                if binary:
+                    bin_patch_apply(wine_variant_source_path, commit_id, patchfiles[commit_id])
+                else:
+                    patch_apply(wine_variant_source_path, commit_id, patchfiles[commit_id])
 
     # ERROR: dlls/wineps.drv/psdrv.h:389:5: error: unknown type name ‘PSDRV_DEVMODEA’
-    # ERROR: dlls/wineps.drv/init.c:43:14: error: unknown type name ‘PSDRV_DEVMODE’
-    # ERROR: dlls/wineps.drv/init.c:605:16: error: ‘cupsGetPPD’ undeclared (first use in this function); did you mean ‘cupsGetFd’?
     # GIT-start: https://source.winehq.org/git/wine.git/commit/d963a8f864a495f7230dc6fe717d71e61ae51d67
     # GIT-end: https://source.winehq.org/git/wine.git/commit/72cfc219f0ba2fc3aea19760558f7820f4883176
-    # GIT: https://source.winehq.org/git/wine.git/commit/bdaddc4b7c4b4391b593a5f4ab91b8121c698bef
-    if wine_version >= Version("1.3.28") and wine_version < Version("1.5.2"):
+    if wine_version >= parse_version("1.3.28") and wine_version < parse_version("1.5.2"):
         # Way too many patches for fixing this, even across modules. Disable module.
-        configure_options += " --disable-wineps.drv"
-    if wine_version >= Version("1.5.2") and wine_version < Version("1.5.7"):
-        patch_apply(wine_variant_source_path, "bdaddc4b7c4b4391b593a5f4ab91b8121c698bef")
-
-    # ERROR: dlls/winspool.drv/info.c:779:13: error: ‘cupsGetPPD’ undeclared here (not in a function); did you mean ‘cupsGetFd’?
-    # URL: https://bugs.winehq.org/show_bug.cgi?id=40851
-    # GIT: https://source.winehq.org/git/wine.git/commit/10065d2acd0a9e1e852a8151c95569b99d1b3294
-    # REBASE-FIX needed due to: https://source.winehq.org/git/wine.git/commitdiff/cf0e96c6d0edc3a22b8ee5ac423d9b6b652ce0e5
-    # FIXED: wine-1.9.14
-    if wine_version >= Version("1.3.28") and wine_version < Version("1.7.12"):
-        patch_apply(wine_variant_source_path, "2ac0c877f591be14815902b527f314a915eee147")
-    if wine_version >= Version("1.7.12") and wine_version < Version("1.9.14"):
-        # stable > 1.8.3 already has cherry-pick as 17a826192ec458b1f090021db7f03e31fbfe7464
-        if wine_version not in [Version("1.8.4"), Version("1.8.5"), Version("1.8.6"), Version("1.8.7")]:
-            patch_apply(wine_variant_source_path, "10065d2acd0a9e1e852a8151c95569b99d1b3294")
-
-    # ERROR: dlls/secur32/schannel_gnutls.c:45:12: error: conflicting types for ‘gnutls_cipher_get_block_size’
-    # URL: https://bugs.debian.org/cgi-bin/bugreport.cgi?bug=832275
-    # GIT: https://source.winehq.org/git/wine.git/commit/bf5ac531a030bce9e798ab66bc53e84a65ca8fdb
-    # FIXED: wine-1.9.13
-    if wine_version >= Version("1.7.46") and wine_version < Version("1.9.13"):
-        # stable > 1.8.3 already has cherry-pick as fad28964903e708e3236ebe72c11a6024d349db1
-        if wine_version not in [Version("1.8.4"), Version("1.8.5"), Version("1.8.6"), Version("1.8.7")]:
-            patch_apply(wine_variant_source_path, "bf5ac531a030bce9e798ab66bc53e84a65ca8fdb")
-
-    # ERROR: include/winsock.h:401: warning: "INVALID_SOCKET" redefined
-    # GIT: https://source.winehq.org/git/wine.git/commit/28173f06932edd85a64a952120d29b9bb1e762ea
-    # FIXED: wine-2.13
-    # wpcap code introduced by: https://source.winehq.org/git/wine.git/commitdiff/fa67586811765d88d3b4108b3e5b4e51bb07868f
-    if wine_version >= Version("1.7.25") and wine_version < Version("2.13"):
-        # stable > 2.0.2 already has cherry-pick as 773cad9f16ecc9aaf751e05cdf2f6f408c582305
-        if wine_version not in [Version("2.0.3"), Version("2.0.4"), Version("2.0.5")]:
-            bin_patch_apply(wine_variant_source_path, "28173f06932edd85a64a952120d29b9bb1e762ea")
-
-    # wine-1.5.30-x86_64/bin/wine:
-    #       error while loading shared libraries: libwine.so.1: cannot open shared object file: No such file or directory
-    # URL: https://bugs.winehq.org/show_bug.cgi?id=33560
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/ce4b6451aabbe83809c7483c748cfa009cc090d6
-    # FIXED: wine-1.5.31
-    if wine_version >= Version("1.5.30") and wine_version < Version("1.5.31"):
-        patch_apply(wine_variant_source_path, "ce4b6451aabbe83809c7483c748cfa009cc090d6")
-
-    # ERROR: rm -f fonts && ln -s ../mainline-build-1.9.5-x86_64/fonts fonts
-    #        rm: cannot remove 'fonts': Is a directory
-    # URL: https://bugs.winehq.org/show_bug.cgi?id=40253
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/c6d6dcee47eb97fd75e389434d4136de2f31414c
-    # FIXED: wine-1.9.6
-    if wine_version >= Version("1.9.5") and wine_version < Version("1.9.6"):
-        patch_apply(wine_variant_source_path, "c6d6dcee47eb97fd75e389434d4136de2f31414c")
-
-    # ERROR: gstreamer-1.0 base plugins 32-bit development files not found, gstreamer support disabled
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/20d41d9e2810696ca38598abcef6da8e77f9aae7
-    # FIXED: wine-2.10
-    if wine_version >= Version("1.4") and wine_version < Version("2.10"):
-        patch_apply(wine_variant_source_path, "20d41d9e2810696ca38598abcef6da8e77f9aae7")
-
-    # configure: Don't use X_PRE_LIBS.
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/bb50d6fd9512a9a05306c56112bbcdc6de6c8d65
-    # FIXED: wine-1.7.2
-    if wine_version >= Version("1.5.17") and wine_version < Version("1.7.2"):
-        # stable >= 1.6.1 already has cherry-pick as 4238c42c7c5168841b5703ed20f2a6cef403b181
-        if wine_version not in [Version("1.6.1"), Version("1.6.2")]:
-            patch_apply(wine_variant_source_path, "bb50d6fd9512a9a05306c56112bbcdc6de6c8d65")
-
-    # ERROR: configure: libOSMesa 64-bit development files not found (or too old)
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/f625707ffc38c58cc296c8a27ac6c2b3e1c38249
-    # REBASE-FIX needed due to: https://source.winehq.org/git/wine.git/commitdiff/cf0e96c6d0edc3a22b8ee5ac423d9b6b652ce0e5
-    # FIXED: wine-2.7
-    if wine_version >= Version("1.6") and wine_version < Version("1.7.12"):
-        patch_apply(wine_variant_source_path, "324305bb282aa4d4de471c43d5c129d2bdd97711")
-    if wine_version >= Version("1.7.12") and wine_version < Version("2.7"):
-        # stable > 2.0.4 already has cherry-pick
-        if wine_version not in [Version("2.0.5")]:
-            patch_apply(wine_variant_source_path, "f625707ffc38c58cc296c8a27ac6c2b3e1c38249")
-
-    # backport for prelink support
-    # winegcc: Set the LDDLLFLAGS according to the target platform.
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/2374cd52a72d685d4f7ddb88456a846e6396415f
-    # FIXED: wine-1.7.1
-    if wine_version >= Version("1.5.30") and wine_version < Version("1.7.1"):
-        patch_apply(wine_variant_source_path, "2374cd52a72d685d4f7ddb88456a846e6396415f")
-    # configure: WARNING: prelink not found, base address of core dlls won't be set correctly.
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a35f9a13a80fa93c251e12402a73a38a89ec397f
-    # FIXED: wine-1.7.54
-    if wine_version >= Version("1.5.30") and wine_version < Version("1.7.54"):
-        patch_apply(wine_variant_source_path, "a35f9a13a80fa93c251e12402a73a38a89ec397f")
-
-    # Fix build failure ('major' undefined) in glibc 2.28.
-    # ERROR: server/fd.c:922:9: warning: implicit declaration of function ‘major’ [-Wimplicit-function-declaration]
-    #                  922 |     if (major(dev) == FLOPPY_MAJOR) return 1;
-    #        /usr/bin/ld: fd.o: in function `is_device_removable':
-    #         server/fd.c:922: undefined reference to `major'
-    #         collect2: error: ld returned 1 exit status
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/ca8a08606d3f0900b3f4aa8f2e6547882a22dba8
-    # FIXED: wine-1.9.9
-    if wine_version >= Version("1.7.44") and wine_version < Version("1.9.9"):
-        # stable > 1.8.2 already has cherry-pick as d133be20b15f0656430e48ff681fd6bab786528c
-        if wine_version not in [Version("1.8.3"), Version("1.8.4"), Version("1.8.5"), Version("1.8.6"), Version("1.8.7")]:
-           patch_apply(wine_variant_source_path, "ca8a08606d3f0900b3f4aa8f2e6547882a22dba8")
-    # REBASE-FIX needed for ca8a08606d3f0900b3f for older Wine versions
-    if wine_version < Version("1.7.44"):
-        patch_apply(wine_variant_source_path, "4f862879c86aedef6d81982d4f828a3109b2192f")
-
-    # Fix build failure for glibc 2.30+
-    # ERROR: dlls/ntdll/directory.c:145:19: error: conflicting types for ‘getdents64’
-    #         145 | static inline int getdents64( int fd, char *de, unsigned int size )
-    #        In file included from /usr/include/dirent.h:404,
-    #             from dlls/ntdll/directory.c:29:
-    #        /usr/include/bits/dirent_ext.h:29:18: note: previous declaration of ‘getdents64’ was here
-    #   29 | extern __ssize_t getdents64 (int __fd, void *__buffer, size_t __length)
-    # make[1]: *** [Makefile:393: directory.o] Error 1
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/12fc123338f7af601d3fe76b168a644fcd7e1362
-    # Smaller custom fix needed due to change buried in large rework commit.
-    # FIXED: wine-1.9.10
-    # Intermediate fixup because d189f95d71f1246a doesn't apply cleanly on older Wine versions
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/606c88a348fa240359a25aa5a3659a0b41ee0cb4
-    if wine_version >= Version("1.5.11"):
-        if wine_version < Version("1.5.23"):
-            patch_apply(wine_variant_source_path, "606c88a348fa240359a25aa5a3659a0b41ee0cb4")
-        # Intermediate fixup because d189f95d71f1246a doesn't apply cleanly on older Wine versions
-        # GIT: https://source.winehq.org/git/wine.git/commitdiff/3ae113a957d396d400a88259634e2870368f307b
-        if wine_version < Version("1.7.26"):
-            patch_apply(wine_variant_source_path, "3ae113a957d396d400a88259634e2870368f307b")
-        if wine_version < Version("1.9.10"):
-            patch_apply(wine_variant_source_path, "d189f95d71f1246a8683b14c5b64b0ec5308492f")
-    else:
-        patch_apply(wine_variant_source_path, "cba95b7eb3986b201dfca5a3e6d9065edecb8188")
-
-
-    # Freetype 2.8.1 build failures
-    # ERROR: ../tools/sfnt2fon/sfnt2fon -o coure.fon .../mainline-src-2.17/fonts/courier.ttf -d 128 13,1252,8
-    #        Error: Cannot open face .../mainline-src-2.17/fonts/courier.ttf
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/40166848a7944383a4cfdaac9b18bd03fbb2b4f9
-    #      https://source.winehq.org/git/wine.git/commitdiff/7ea82a02079d1600191743cc2c148955efe725fb
-    #      https://source.winehq.org/git/wine.git/commitdiff/d82321006de92dcd74465c905121618a76eae76a
-    #      https://source.winehq.org/git/wine.git/commitdiff/89e79d8144308a24676ef069d567a14655985b0c
-    # FIXED: wine-2.18
-    if wine_version >= Version("1.7.12") and wine_version < Version("2.18"):
-        # stable > 2.0.2 already has cherry-pick
-        if wine_version not in [Version("2.0.3"), Version("2.0.4"), Version("2.0.5")]:
-            patch_apply(wine_variant_source_path, "89e79d8144308a24676ef069d567a14655985b0c")
-    if wine_version < Version("2.18"):
-        if wine_version < Version("1.5.16"):
-            patch_apply(wine_variant_source_path, "8ef70039d366bf45900c7e7999767be2ccf9704c")
-            patch_apply(wine_variant_source_path, "7cd8dc6bf2b0d81338db9a6d13669b2f31da33d8")
-        # stable > 2.0.2 already has cherry-pick
-        if wine_version not in [Version("2.0.3"), Version("2.0.4"), Version("2.0.5")]:
-            patch_apply(wine_variant_source_path, "d82321006de92dcd74465c905121618a76eae76a")
-    if wine_version >= Version("1.7.12") and wine_version < Version("2.18"):
-        patch_apply(wine_variant_source_path, "7ea82a02079d1600191743cc2c148955efe725fb")
-        # stable > 2.0.2 already has cherry-pick
-        if wine_version not in [Version("2.0.3"), Version("2.0.4"), Version("2.0.5")]:
-            bin_patch_apply(wine_variant_source_path, "40166848a7944383a4cfdaac9b18bd03fbb2b4f9")
-    # REBASE-FIX needed for 7ea82a02079d16 and 40166848a7944383a for older Wine versions
-    # Apply prerequisite patches on older Wine versions because a326e29144b74c0b3a doesn't apply cleanly
-    if wine_version < Version("1.4-rc1"):
-        bin_patch_apply(wine_variant_source_path, "3e6199904f4fc2bf1612f210e07e18435a46a38f")
-        bin_patch_apply(wine_variant_source_path, "5d2b9eb9d3e15c3787571000e6a75673a42a0c49")
-        bin_patch_apply(wine_variant_source_path, "a926bfdb061ffcdc3c6f88b29fca614f9f12fa78")
-        bin_patch_apply(wine_variant_source_path, "4b71072b861cc396c4c50806db034f98869e2cc1")
-    if wine_version < Version("1.5.2"):
-        if wine_version != Version("1.4.1"):
-            # Wine 1.4.1 has this as cherry-pick:
-            # https://source.winehq.org/git/wine.git/commitdiff/1823a4ae52b970436943760f028e2c154fd9985d
-            bin_patch_apply(wine_variant_source_path, "4f819f8efcd08e29a1a7650300e204839b43af2c")
-        bin_patch_apply(wine_variant_source_path, "fc42bfe60f3a29c4ce0ed47eb03cc3125be904fd")
-    if wine_version < Version("1.5.16"):
-        bin_patch_apply(wine_variant_source_path, "679385fd1cd2c405ac0d3745863d827293a3b445")
-        bin_patch_apply(wine_variant_source_path, "673617ee4eb15aa778859d3bcc227e8d8a514e01")
-    if wine_version < Version("1.5.18"):
-        bin_patch_apply(wine_variant_source_path, "e070173ac6316cd9afc2755087d8e6b95b6cdafe")
-        bin_patch_apply(wine_variant_source_path, "1a6e9d4a50ec4a1a5464ca9c3bb02921d50eb777")
-    if wine_version < Version("1.5.20"):
-        bin_patch_apply(wine_variant_source_path, "9d71d29f26a6f89d4e603c60e355d2ed39153b7f")
-    if wine_version < Version("1.5.25"):
-        bin_patch_apply(wine_variant_source_path, "1b17f0fd5ded290a332260cad963dac53c08609f")
-    if wine_version < Version("1.5.28"):
-        bin_patch_apply(wine_variant_source_path, "6eaa345261fad0e0a0e04f265ce6f731302ed674")
-        bin_patch_apply(wine_variant_source_path, "c4408e0b621b99115247386e7095231be7e1045d")
-    if wine_version < Version("1.5.31"):
-        patch_apply(wine_variant_source_path, "d29f6c41eb13e647a311091956af3131633e7eda")
-        bin_patch_apply(wine_variant_source_path, "3f0e3ef6b4f422d0528d8031bbad3727face17dd")
-        bin_patch_apply(wine_variant_source_path, "8e2cd615c3dc884dc76bd75a77d35fc1fcaf8217")
-    if wine_version < Version("1.6-rc2"):
-        bin_patch_apply(wine_variant_source_path, "121f82bff7665794be6fee841ddfda6973cc7c46")
-        bin_patch_apply(wine_variant_source_path, "2fd3ec7d068ef925e5720222e92cfda4f6badd2a")
-    if wine_version < Version("1.6-rc5"):
-        bin_patch_apply(wine_variant_source_path, "74b2cb58f7f1192d6b0a7c1bc31a64eb92ccaa86")
-        bin_patch_apply(wine_variant_source_path, "66f641896b8056a818b06f07055d1161c36941c1")
-        bin_patch_apply(wine_variant_source_path, "eb29e639e579535009a4626fede64e3cf34e7009")
-        bin_patch_apply(wine_variant_source_path, "994f74fb46285130cc63784449176c748cfdfaaf")
-        bin_patch_apply(wine_variant_source_path, "7983df22cfd97399575652e72c90203597a818a7")
-        bin_patch_apply(wine_variant_source_path, "80a17baf20da4620394f8832f6221edf45b7a0f0")
-    # REBASE-FIX for 7ea82a02079d16 and 40166848a7944383a for older Wine versions
-
-    if wine_version < Version("1.7.12"):
-        bin_patch_apply(wine_variant_source_path, "a326e29144b74c0b3a0261142892192b99607141")
-
-    # wpcap: Fix compilation with recent pcap/pcap.h versions.
-    # ERROR: In file included from .../include/winsock2.h:50,
-    #        from ... dlls/wpcap/wpcap.c:27:
-    #        .../include/ws2def.h:60:19: error: redefinition of ‘struct sockaddr_storage’
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/40c9b46500c3606e966d5404d45b68a48609b6ea
-    # FIXED: wine-4.3
-    if wine_version >= Version("1.7.25") and wine_version < Version("4.3"):
-        # stable > 4.0.1 already has cherry-pick as 2a532f4809fc0328877c1f8219609c526daaba8b
-        if wine_version not in [Version("4.0.1"), Version("4.0.2"), Version("4.0.3"), Version("4.0.4")]:
-            patch_apply(wine_variant_source_path, "40c9b46500c3606e966d5404d45b68a48609b6ea")
-
-    # loader/preloader build failure with GCC 10.x optimizing wld_memset() into a memset(3) call.
-    # ERROR:  /usr/bin/ld: preloader.o: in function `wld_memset':
-    #          .../loader/preloader.c:455: undefined reference to `memset'
-    #          collect2: error: ld returned 1 exit status
-    #          make[1]: *** [Makefile:335: wine64-preloader] Error 1
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a6fdf73233d3df4435680d921f68089630bc9c64
-    # FIXED: wine-1.5.21
-    if wine_version < Version("1.5.21"):
-        patch_apply(wine_variant_source_path, "a6fdf73233d3df4435680d921f68089630bc9c64")
-
-    # /usr/bin/ld: ios.o: relocation R_X86_64_32 against symbol `basic_streambuf_char_overflow'
-    #          can not be used when making a shared object; recompile with -fPIC
-    #       make[1]: *** [Makefile:338: msvcp90.dll.so] Error 2
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/72999eac5b315102d3d7d48aaf6d687ca8ec8d96
-    #      https://source.winehq.org/git/wine.git/commitdiff/07a9909ccaea1e9626731c4b259f555877d50bb2
-    if wine_version < Version("1.3.35"):
-        patch_apply(wine_variant_source_path, "07a9909ccaea1e9626731c4b259f555877d50bb2")
-        patch_apply(wine_variant_source_path, "72999eac5b315102d3d7d48aaf6d687ca8ec8d96")
-
-    # libxml2 fixes
-    #  ../dlls/msxml3/mxwriter.c:412:60: error: invalid use of incomplete typedef â€˜xmlBufâ€™ {aka â€˜struct _xmlBufâ€™}
-    #    412 |                                          This->buffer->conv->use/sizeof(WCHAR));
-    #    make[1]: *** [Makefile:215: mxwriter.o] Error 1
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a4b24978e9dc2e54057552fc2efffbd58cc25d0a
-    #      https://source.winehq.org/git/wine.git/commitdiff/197d41156a1a237eb2073524ec36006d6a26ceaa
-    #      https://source.winehq.org/git/wine.git/commitdiff/b0f704daaf633d8c713c9212a2ab5dd8a4457e7a
-    #      https://source.winehq.org/git/wine.git/commitdiff/d80ee5b3ae36275f813b096576b5beecea2c2d60
-    #      https://source.winehq.org/git/wine.git/commitdiff/fda8c2177d01c767c020864370cf9dfaf7b6755d
-    #      https://source.winehq.org/git/wine.git/commitdiff/35c7c694294d5461b84e18b17b65a99068050e8b
-    if wine_version < Version("1.3.35"):
-        patch_apply(wine_variant_source_path, "a4b24978e9dc2e54057552fc2efffbd58cc25d0a")
-        patch_apply(wine_variant_source_path, "197d41156a1a237eb2073524ec36006d6a26ceaa")
-        patch_apply(wine_variant_source_path, "b0f704daaf633d8c713c9212a2ab5dd8a4457e7a")
-        patch_apply(wine_variant_source_path, "d80ee5b3ae36275f813b096576b5beecea2c2d60")
-        patch_apply(wine_variant_source_path, "fda8c2177d01c767c020864370cf9dfaf7b6755d")
-        patch_apply(wine_variant_source_path, "35c7c694294d5461b84e18b17b65a99068050e8b")
-
-    # ERROR: 'err:msi:MSI_OpenDatabaseW unknown flag (nil)' ... 'err:msi:msi_apply_patch_package
-    # Fixup for GCC 9.x/10.x/MinGW
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/cce9a5f124ae6d3fffcc7772cab6523f09a1e3d1
-    # FIXED: wine-4.20
-    # MSI changes in Wine 1.7.38 and 1.7.39 make patch/rebase way too much effort hence skip fix below
-    if wine_version >= Version("1.7.40") and wine_version < Version("4.20"):
-        patch_apply(wine_variant_source_path, "cce9a5f124ae6d3fffcc7772cab6523f09a1e3d1")
+        configure_options.append("--disable-wineps.drv")
 
     # ERROR: /usr/bin/ld: chain.o:../dlls/crypt32/crypt32_private.h:155: multiple definition of `hInstance';
     #        cert.o:../dlls/crypt32/crypt32_private.h:155: first defined here
     # Fixup for GCC 10.x: https://gcc.gnu.org/gcc-10/porting_to.html#c
     # Pass '-fcommon' to CFLAGS to avoid applying a dozen commits to various components starting with
     # GIT: https://source.winehq.org/git/wine.git/commit/5740b735cdb44fb89a41f3090dcc3dabf360ab41
-    if wine_version < Version("5.1"):
+    if wine_version < parse_version("5.1"):
         wine_cflags_common += " -fcommon"
 
-    # mpg123: Fix compilation with clang.
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/981306c1f01112719850439a74e13693dfa6d3a4
-    if wine_version == Version("6.20"):
-        patch_apply(wine_variant_source_path, "981306c1f01112719850439a74e13693dfa6d3a4")
-
-    # opencl: Fix compilation on MSVC targets.
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a91d6e9eae71a0ed0ddeac3d571704fd3e47b3c5
-    if wine_version >= Version("6.5") and wine_version < Version("6.18"):
-        patch_apply(wine_variant_source_path, "a91d6e9eae71a0ed0ddeac3d571704fd3e47b3c5")
-
     # ERROR: tools/wrc/wrc -u -o dlls/gdi32/gdi32.res -m64 --nostdinc --po-dir=po -Idlls/gdi32 \
     #        -I/usr/lib64/glib-2.0/include -I/usr/include/sysprof-4 -I/usr/include/libxml2 -D__WINESRC__ \
     #        -pthread -D_GDI32_ -D_UCRT .../dlls/gdi32/gdi32.rc
@@ -802,59 +1625,56 @@ def main():
     # URL: https://bugs.winehq.org/show_bug.cgi?id=50811
     # GIT: https://source.winehq.org/git/wine.git/commitdiff/4f04994ef47b5077e13c1b770ed0f818f59adcd5
     # FIXED: wine-6.6
-    if wine_version <= Version("6.5"):
+    if wine_version <= parse_version("6.5"):
         # needed for erroneous FREETYPE_CFLAGS
         my_env["PKG_CONFIG"] = create_config_wrapper(my_env["PKG_CONFIG"], "--cflags freetype2", "-pthread")
         # needed for erroneous FONTCONFIG_CFLAGS
         # NOTE: The second wrapper will call the first wrapper which in turn will call the original pkg-config
         my_env["PKG_CONFIG"] = create_config_wrapper(my_env["PKG_CONFIG"], "--cflags fontconfig", "-pthread")
         # needed for erroneous FREETYPEINCL
-        if wine_version < Version("1.5.2"):
+        if wine_version < parse_version("1.5.2"):
             # original config tool is provided with full path so wrapper doesn't create a recursion
             wrapper_path = os.path.dirname( create_config_wrapper(shutil.which("freetype-config"), "--cflags", "-pthread"))
             # inject wrapper into PATH
             my_env["PATH"] = "{0}:{1}".format(wrapper_path, my_env["PATH"])
 
-    # ERROR: winebuild: llvm-mingw-20211002-ucrt-ubuntu-18.04-x86_64/bin/x86_64-w64-mingw32-dlltool failed with status 1
-    #        make: *** [Makefile:1843: dlls/advpack/libadvpack.delay.a] Error 1
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/f29d4a43e203303c2d4aaec388f281d01f17764c
-    # FIXED: wine-5.3
-    if wine_version == Version("5.2"):
-        patch_apply(wine_variant_source_path, "f29d4a43e203303c2d4aaec388f281d01f17764c")
-
-    # ERROR: /usr/bin/ld: dlls/dnsapi/libresolv.o: in function `resolv_query':
-    #        .../dlls/dnsapi/libresolv.c:897: undefined reference to `ns_initparse'
-    #       /usr/bin/ld: .../dlls/dnsapi/libresolv.c:769: undefined reference to `ns_parserr'
-    # URL: https://bugs.winehq.org/show_bug.cgi?id=51635
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/a3bbf5137707abb548ff642826992b7069bef1de
-    # FIXED: wine-6.16
-    if wine_version >= Version("6.6") and wine_version < Version("6.16"):
-        patch_apply(wine_variant_source_path, "a3bbf5137707abb548ff642826992b7069bef1de")
-
-    # ERROR: ../../tools/winegcc/winegcc -o ntdll.dll.so -B../../tools/winebuild -m64 -fasynchronous-unwind-tables -shared
-    #        mainline-src-1.7.45/dlls/ntdll/ntdll.spec \
-    #        ...
-    #        /usr/bin/ld: signal_x86_64.o: in function `libunwind_virtual_unwind':
-    #        mainline-src-1.7.45/dlls/ntdll/signal_x86_64.c:1554: undefined reference to `_Ux86_64_getcontext'
-    # GIT: https://source.winehq.org/git/wine.git/commitdiff/36a9f9dd05c3b9df77c44c91663e9bd6cae1c848
-    if wine_version == Version("1.7.45"):
-        patch_apply(wine_variant_source_path, "36a9f9dd05c3b9df77c44c91663e9bd6cae1c848")
-
     ##################################################################
     # run 'autoreconf' and 'tools/make_requests' if requested
+    make_requests_future = None
     if args.force_autoconf:
 
-        # update configure scripts
-        run_command("autoreconf -f", wine_variant_source_path)
-        # update wineserver protocol
-        run_command("./tools/make_requests", wine_variant_source_path)
+        # skip if nothing changed since the last run
+        autoconf_stamp_path = os.path.join(wine_variant_source_path, AUTOCONF_STAMP_FILE)
+        try:
+            with open(autoconf_stamp_path) as f:
+                autoconf_stamp_last = f.read().strip()
+        except FileNotFoundError:
+            autoconf_stamp_last = ""
+
+        if autoconf_stamp_last != autoconf_stamp(wine_variant_source_path):
+            # update configure scripts
+            run_command(["autoreconf", "-f"], wine_variant_source_path)
+            # update wineserver protocol, 'configure' doesn't depend on it hence run it concurrently
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            make_requests_future = executor.submit(run_command, ["./tools/make_requests"], wine_variant_source_path)
+            # no further work, the worker thread finishes with the submitted one
+            executor.shutdown(wait=False)
+        else:
+            print("[*] Source tree unchanged since last 'autoreconf', skipping")
 
     ##################################################################
     # clean build directories if requested
     if args.clean:
 
-        shutil.rmtree(wine_build_target_arch32_path, ignore_errors=True)
-        shutil.rmtree(wine_build_target_arch64_path, ignore_errors=True)
+        remove_tree(wine_build_target_arch32_path)
+        remove_tree(wine_build_target_arch64_path)
+
+    # NOTE: no load average limit by default, the load average is a poor CPU usage metric on virtualized builders
+    make_flags = "-j{0}".format(args.jobs)
+    # honor $MAKE like recursive makefiles do, e.g. 'gmake' where 'make' isn't GNU Make
+    wine_make = shlex.split(my_env.get("MAKE", "make"))
+    if args.load_average:
+        make_flags += " -l{0}".format(args.load_average)
 
     ##################################################################
     # configure 64-bit Wine
@@ -863,15 +1683,18 @@ def main():
         os.makedirs(wine_build_target_arch64_path, exist_ok=True)
 
         my_env["CFLAGS"] = "{0} {1}".format(wine_cflags_common, wine_cflags_target_arch64)
-        my_env["MAKEFLAGS"] = "-j{0} -l{0}".format(args.jobs)
+        my_env["MAKEFLAGS"] = make_flags
 
-        logfile = "build_{0}.log".format(wine_target_arch64)
+        logfile_arch64 = "build_{0}.log".format(wine_target_arch64)
 
         if not args.no_configure:
 
-            run_command("{0}/configure --prefix={1} {2} {3} --enable-win64 2>&1 | tee {4}".format(
-                wine_variant_source_path, wine_install_prefix, wine_cross_compile_options,
-                configure_options, logfile), wine_build_target_arch64_path, my_env)
+            configure_args = ["{0}/configure".format(wine_variant_source_path),
+                "--prefix={0}".format(wine_install_prefix)] + wine_cross_compile_options + \
+                configure_options + ["--enable-win64"]
+
+            run_configure(wine_variant_source_path, wine_build_target_arch64_path, configure_args, my_env,
+                          logfile_arch64, args.configure_cache)
 
     ##################################################################
     # configure 32-bit Wine
@@ -880,59 +1703,101 @@ def main():
         os.makedirs( wine_build_target_arch32_path, exist_ok=True)
 
         my_env["CFLAGS"] = "{0} {1}".format( wine_cflags_common, wine_cflags_target_arch32)
-        my_env["MAKEFLAGS"] = "-j{0} -l{0}".format(args.jobs)
+        my_env["MAKEFLAGS"] = make_flags
 
-        logfile = "build_{0}.log".format( wine_target_arch32)
+        logfile_arch32 = "build_{0}.log".format( wine_target_arch32)
 
         if not args.no_configure:
 
-            run_command("{0}/configure --prefix={1} {2} {3} --with-wine64={4} 2>&1 | tee {5}".format(
-                wine_variant_source_path, wine_install_prefix, wine_cross_compile_options,
-                configure_options, wine_build_target_arch64_path, logfile), wine_build_target_arch32_path, my_env)
+            configure_args = ["{0}/configure".format(wine_variant_source_path),
+                "--prefix={0}".format(wine_install_prefix)] + wine_cross_compile_options + \
+                configure_options + ["--with-wine64={0}".format(wine_build_target_arch64_path)]
+
+            run_configure(wine_variant_source_path, wine_build_target_arch32_path, configure_args, my_env,
+                          logfile_arch32, args.configure_cache)
+
+    # wait for the wineserver protocol update, the stamp is written only after both steps succeeded
+    if make_requests_future:
+        make_requests_future.result()
+        with open(autoconf_stamp_path, 'w') as f:
+            f.write(autoconf_stamp(wine_variant_source_path))
 
     # don't attempt to build if "configure only" mode requested
     if args.configure_only:
         sys.exit(0)
 
     ##################################################################
-    # build 64-bit Wine
-    if wine_build_target_arch64_path:
-
-        run_command("make 2>&1 | tee -a {0}".format(logfile), wine_build_target_arch64_path, my_env)
+    # build Wine host tools only, about 2% of the code base compared to a full build
+    if args.tools_only:
+        if wine_build_target_arch64_path:
+            run_command(wine_make + ["__tooldeps__"], wine_build_target_arch64_path, my_env, logfile_arch64,
+                        append=True)
+        else:
+            run_command(wine_make + ["__tooldeps__"], wine_build_target_arch32_path, my_env, logfile_arch32,
+                        append=True)
+        sys.exit(0)
 
     ##################################################################
-    # build 32-bit Wine
-    if wine_build_target_arch32_path:
+    # build 64-bit and 32-bit Wine concurrently if requested
+    # NOTE: Only the 'make' steps overlap. Both 'configure' runs take a fraction of the build time and
+    # 'make install' stays serial since the shared WoW64 install prefix is populated by both builds.
+    if args.parallel_archs and wine_build_target_arch64_path and wine_build_target_arch32_path:
+
+        # The 32-bit build uses the tools from the 64-bit build tree (--with-wine64), build them first
+        run_command(wine_make + ["__tooldeps__"], wine_build_target_arch64_path, my_env, logfile_arch64, append=True)
+
+        # Both 'make' processes obtain their job slots from a shared jobserver to avoid oversubscription
+        jobserver_fds = create_make_jobserver(args.jobs, 2)
+        parallel_env = dict(my_env)
+        # '--output-sync' keeps the output of each target together on the shared terminal
+        parallel_env["MAKEFLAGS"] = "{0} --output-sync=target --jobserver-auth={1},{2}".format(
+            my_env["MAKEFLAGS"], *jobserver_fds)
+        try:
+            run_commands([(wine_make, wine_build_target_arch64_path, logfile_arch64),
+                          (wine_make, wine_build_target_arch32_path, logfile_arch32)],
+                          parallel_env, jobserver_fds)
+        finally:
+            for fd in jobserver_fds:
+                os.close(fd)
+
+    else:
+        ##################################################################
+        # build 64-bit Wine
+        if wine_build_target_arch64_path:
 
-        run_command("make 2>&1 | tee -a {0}".format(logfile), wine_build_target_arch32_path, my_env)
+            run_command(wine_make, wine_build_target_arch64_path, my_env, logfile_arch64, append=True)
 
-    # always remove old install directories before install step
-    shutil.rmtree(wine_install_prefix, ignore_errors=True)
+        ##################################################################
+        # build 32-bit Wine
+        if wine_build_target_arch32_path:
+
+            run_command(wine_make, wine_build_target_arch32_path, my_env, logfile_arch32, append=True)
+
+    # always remove old install directories before install step, the deletion overlaps with 'make install'
+    remove_tree(wine_install_prefix)
 
     ##################################################################
     # install 64-bit Wine
     if wine_build_target_arch64_path:
 
-        run_command("make install | tee -a {0}".format(logfile), wine_build_target_arch64_path, my_env)
+        run_command(wine_make + ["install"], wine_build_target_arch64_path, my_env, logfile_arch64, append=True)
 
         # Copy the PDB files into install DESTDIR.
-        run_command(r"find {0} -type f -name '*.pdb' -exec cp -v '{{}}' '{1}/{2}' \;".format(
-            wine_build_target_arch64_path, wine_install_prefix, wine_install_arch64_pe_dir))
+        install_pdbs(wine_build_target_arch64_path, "{0}/{1}".format(wine_install_prefix, wine_install_arch64_pe_dir))
 
     ##################################################################
     # install 32-bit Wine
-    if wine_build_target_arch64_path:
+    if wine_build_target_arch32_path:
 
-        run_command("make install | tee -a {0}".format(logfile), wine_build_target_arch32_path, my_env)
+        run_command(wine_make + ["install"], wine_build_target_arch32_path, my_env, logfile_arch32, append=True)
 
         # Make a lib32 symlink to lib to allow 'winegcc -m32'.
         # Since Wine 6.8, libraries are installed into architecture-specific subdirectories.
-        if wine_version < Version("6.8"):
+        if wine_version < parse_version("6.8"):
             os.symlink("lib", "{0}/lib32".format(wine_install_prefix))
 
         # Copy the PDB files into install DESTDIR.
-        run_command(r"find {0} -type f -name '*.pdb' -exec cp -v '{{}}' '{1}/{2}' \;".format(
-            wine_build_target_arch32_path, wine_install_prefix, wine_install_arch32_pe_dir))
+        install_pdbs(wine_build_target_arch32_path, "{0}/{1}".format(wine_install_prefix, wine_install_arch32_pe_dir))
 
     print(
     """